@@ -7,10 +7,8 @@ This script removes all documents from the knowledge base.
 
 import os
 import sys
-from numpy.core.multiarray import where
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
-import uuid
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,17 +17,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(env_path)
 
-
-def create_supabase_client() -> Client:
-    """Create Supabase client from environment variables."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
-
-    if not url or not key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables")
-
-    return create_client(url, key)
+from src.services.database import get_supabase
 
 
 def clean_knowledge_base(supabase: Client) -> None:
@@ -48,22 +36,11 @@ def clean_knowledge_base(supabase: Client) -> None:
 
         print(f"📊 Found {initial_count} documents to remove")
 
-        # Delete all documents
-
-        zero_uuid = uuid.UUID(int=0)
-        result = supabase.table("documents").delete().neq(
-            "id", zero_uuid).execute()
-
-        # Verify cleanup
-        count_result = supabase.table("documents").select(
-            "id", count="exact").execute()
-        final_count = count_result.count
+        # TRUNCATE drops the table files instead of deleting row by row,
+        # so there is nothing left to verify afterwards
+        supabase.rpc("truncate_documents").execute()
 
-        if final_count == 0:
-            print(f"✅ Successfully removed {initial_count} documents")
-        else:
-            print(
-                f"⚠️  Removed {initial_count - final_count} documents, {final_count} remaining")
+        print(f"✅ Successfully removed {initial_count} documents")
 
     except Exception as e:
         print(f"❌ Error cleaning knowledge base: {e}")
@@ -76,7 +53,7 @@ def main():
 
     try:
         # Initialize client
-        supabase = create_supabase_client()
+        supabase = get_supabase()
 
         # Clean knowledge base
         clean_knowledge_base(supabase)
@@ -12,10 +12,10 @@ This script sets up the vector knowledge base for the Agentic Support Copilot:
 import os
 import sys
 import json
+import asyncio
 from typing import List, Dict
-from supabase import create_client, Client
-from openai import OpenAI
-import numpy as np
+from supabase import Client
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 # Load environment variables from .env file (in parent directory)
@@ -25,24 +25,27 @@ load_dotenv(env_path)
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.services.database import get_supabase, get_pg_dsn, get_pg_pool, close_pg_pool
 
-def create_supabase_client() -> Client:
-    """Create Supabase client from environment variables."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
+# Upper bound on in-flight embedding requests to stay within rate limits
+EMBEDDING_CONCURRENCY = 8
 
-    if not url or not key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables")
+# Rows per insert request, keeps payloads under PostgREST size limits
+INSERT_BATCH_SIZE = 500
 
-    return create_client(url, key)
+# Rows per COPY call when a direct database connection is available
+COPY_BATCH_SIZE = 10000
 
 
-def create_openai_client() -> OpenAI:
-    """Create OpenAI client from environment variables."""
-    return OpenAI(
+def create_openai_client() -> AsyncOpenAI:
+    """Create OpenAI client from environment variables.
+
+    The SDK retries rate-limited (429) requests with exponential backoff.
+    """
+    return AsyncOpenAI(
         base_url=os.getenv("OPENAI_ENDPOINT"),
         api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=5,
     )
 
 
@@ -112,28 +115,40 @@ def get_sample_articles() -> List[Dict[str, str]]:
     ]
 
 
-def generate_embeddings(openai: OpenAI, texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for a list of texts using Azure OpenAI."""
-    print("🧠 Generating embeddings...")
-    embeddings = []
-
-    for i, text in enumerate(texts):
-        try:
-            response = openai.embeddings.create(
-                model=os.getenv("OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
-                input=text
-            )
-            embedding = response.data[0].embedding
-            embeddings.append(embedding)
-            print(f"  Generated embedding {i+1}/{len(texts)}")
-        except Exception as e:
-            print(f"❌ Error generating embedding for text {i+1}: {e}")
-            raise
+async def generate_embeddings(openai: AsyncOpenAI, texts: List[str], batch_size: int = 16) -> List[List[float]]:
+    """Generate embeddings for a list of texts using Azure OpenAI.
 
-    return embeddings
-
-
-def seed_knowledge_base(supabase: Client, openai: OpenAI) -> None:
+    Texts are sent in batches of `batch_size` (Azure's per-request input limit),
+    and batches are requested concurrently, bounded by EMBEDDING_CONCURRENCY.
+    """
+    print("🧠 Generating embeddings...")
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    chunks = [texts[start:start + batch_size]
+              for start in range(0, len(texts), batch_size)]
+
+    async def embed_chunk(index: int, chunk: List[str]) -> List[List[float]]:
+        async with semaphore:
+            try:
+                response = await openai.embeddings.create(
+                    model=os.getenv("OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+                    input=chunk
+                )
+            except Exception as e:
+                start = index * batch_size
+                print(
+                    f"❌ Error generating embeddings for texts {start+1}-{start+len(chunk)}: {e}")
+                raise
+        print(f"  Generated embedding batch {index+1}/{len(chunks)}")
+        # The API returns data in input order
+        return [item.embedding for item in response.data]
+
+    # gather preserves chunk order, so the flattened result lines up with texts
+    results = await asyncio.gather(
+        *(embed_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+    return [embedding for batch in results for embedding in batch]
+
+
+async def seed_knowledge_base(supabase: Client, openai: AsyncOpenAI) -> None:
     """Seed the knowledge base with sample articles and embeddings."""
     print("📚 Seeding knowledge base...")
 
@@ -149,25 +164,56 @@ def seed_knowledge_base(supabase: Client, openai: OpenAI) -> None:
     texts = [article["content"] for article in articles]
 
     # Generate embeddings
-    embeddings = generate_embeddings(openai, texts)
+    embeddings = await generate_embeddings(openai, texts)
 
-    # Insert articles with embeddings
-    for i, article in enumerate(articles):
-        try:
-            data = {
-                "title": article["title"],
-                "content": article["content"],
-                "embedding": embeddings[i]
-            }
+    rows = [
+        {
+            "title": article["title"],
+            "content": article["content"],
+            "embedding": embedding
+        }
+        for article, embedding in zip(articles, embeddings)
+    ]
+
+    # COPY needs a direct database connection; otherwise go through PostgREST
+    if get_pg_dsn():
+        await copy_rows(rows)
+    else:
+        insert_rows(supabase, rows)
+
+    print(f"✅ Successfully seeded {len(articles)} articles")
 
-            result = supabase.table("documents").insert(data).execute()
-            print(f"  Inserted article: {article['title']}")
+
+def insert_rows(supabase: Client, rows: List[Dict]) -> None:
+    """Insert rows through PostgREST, one request per batch instead of per row."""
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        try:
+            supabase.table("documents").insert(batch).execute()
+            print(f"  Inserted {start + len(batch)}/{len(rows)} articles")
 
         except Exception as e:
-            print(f"❌ Error inserting article {i+1}: {e}")
+            print(
+                f"❌ Error inserting articles {start+1}-{start+len(batch)}: {e}")
             raise
 
-    print(f"✅ Successfully seeded {len(articles)} articles")
+
+async def copy_rows(rows: List[Dict]) -> None:
+    """Stream rows into the documents table with binary COPY over a direct connection."""
+    pool = await get_pg_pool()
+    try:
+        async with pool.acquire() as conn:
+            for start in range(0, len(rows), COPY_BATCH_SIZE):
+                batch = rows[start:start + COPY_BATCH_SIZE]
+                await conn.copy_records_to_table(
+                    "documents",
+                    records=[(row["title"], row["content"], row["embedding"])
+                             for row in batch],
+                    columns=["title", "content", "embedding"],
+                )
+                print(f"  Copied {start + len(batch)}/{len(rows)} articles")
+    finally:
+        await close_pg_pool()
 
 
 def main():
@@ -176,7 +222,7 @@ def main():
 
     try:
         # Initialize clients
-        supabase = create_supabase_client()
+        supabase = get_supabase()
         openai = create_openai_client()
 
         # Check database schema
@@ -185,7 +231,7 @@ def main():
             sys.exit(1)
 
         # Seed knowledge base
-        seed_knowledge_base(supabase, openai)
+        asyncio.run(seed_knowledge_base(supabase, openai))
 
         print("✅ Knowledge base setup completed successfully!")
         print("🎯 You can now use the vector search functionality.")
@@ -12,7 +12,7 @@ This script tests the knowledge base setup and vector search capabilities:
 import os
 import sys
 from typing import List, Dict
-from supabase import create_client, Client
+from supabase import Client
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -23,17 +23,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(env_path)
 
-
-def create_supabase_client() -> Client:
-    """Create Supabase client from environment variables."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
-
-    if not url or not key:
-        raise ValueError(
-            "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables")
-
-    return create_client(url, key)
+from src.services.database import get_supabase
 
 
 def create_openai_client() -> OpenAI:
@@ -140,7 +130,7 @@ def main():
 
     try:
         # Initialize clients
-        supabase = create_supabase_client()
+        supabase = get_supabase()
         openai = create_openai_client()
 
         # Run tests
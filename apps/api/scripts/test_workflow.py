@@ -2,7 +2,11 @@
 """Test the complete AgentWorkflow in isolation."""
 
 import asyncio
-from src.agents.workflow import AgentWorkflow
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (in parent directory)
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
 
 async def test_workflow() -> bool:
@@ -10,6 +14,9 @@ async def test_workflow() -> bool:
     print("🔄 Testing AgentWorkflow in isolation...")
 
     try:
+        # Imported here so the agent stack only loads when the test runs
+        from src.agents.workflow import AgentWorkflow
+
         print("🏗️ Creating AgentWorkflow instance...")
         workflow = AgentWorkflow()
         print("✅ Workflow created successfully")
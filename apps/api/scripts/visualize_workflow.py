@@ -4,6 +4,12 @@ Script to visualize the Agentic Support Copilot workflow.
 Generates a Mermaid diagram showing the agent pipeline flow.
 """
 
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (in parent directory)
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+
 from src.agents.workflow import AgentWorkflow
 
 
@@ -1,9 +1,128 @@
-import json
+import re
 import time
-from datetime import datetime
-from typing import Dict, Any, List
-from ..models.state import AgentState, AgentStep
+from typing import Dict, Any, List, Optional
+import orjson
+from ..models.state import AgentState, create_step
 from ..models.llm import get_llm_provider
+from .retriever import format_sources_block
+
+# Static prompt text comes first and request-specific text last, so the shared
+# prefix can be served from the provider's prompt cache
+GUARD_SYSTEM_PROMPT = """You are a safety validator for customer support responses. Check for harmful content, hallucinations, policy violations, and quality issues. Return JSON with: is_safe (boolean), issues (array of strings), confidence (0-1)."""
+
+# Routes guard requests to the same prompt cache entry
+GUARD_CACHE_KEY = "guard-v1"
+
+# JSON mode keeps the verdict parseable; the lenient parser remains a fallback
+GUARD_RESPONSE_FORMAT = {"type": "json_object"}
+
+# The verdict is a short JSON object
+GUARD_MAX_TOKENS = 300
+
+# Trailing commas before a closing brace or bracket, a common LLM JSON slip
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Local pre-check: answers that pass every check skip the LLM validation call
+MAX_LOCAL_CHECK_CHARS = 1200
+# Share of the answer's content words that must also appear in the sources
+GROUNDING_THRESHOLD = 0.9
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_SSN = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
+_CARD_CANDIDATE = re.compile(r"\b(?:\d[ -]?){13,19}\b")
+_WORD = re.compile(r"[a-z0-9']+")
+_BLOCKED_TERMS = frozenset({
+    "kill", "suicide", "bomb", "weapon", "hate", "idiot", "stupid", "damn",
+})
+# Words that flip a statement's meaning; each must also appear in the sources
+_NEGATIONS = frozenset({
+    "no", "not", "never", "none", "nothing", "nobody", "nor", "cannot", "without",
+})
+# Filler common in support replies; shorter words are ignored anyway
+_STOPWORDS = frozenset({
+    "your", "with", "this", "that", "from", "have", "will", "please", "thank",
+    "thanks", "sorry", "help", "hear", "happy", "feel", "free", "know", "further",
+    "questions", "then", "there", "here", "just", "also",
+})
+
+
+def _passes_luhn(digits: str) -> bool:
+    """Check a digit string against the Luhn checksum used by card numbers."""
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        digit = int(char)
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def check_locally(answer: str, sources: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Validate an answer without an LLM call; returns None when the LLM should decide.
+
+    Passes only short answers with no PII or blocked terms whose numbers and
+    negations all appear in the retrieved sources, and whose content words
+    nearly all do.
+    """
+    if not answer or not sources or len(answer) > MAX_LOCAL_CHECK_CHARS:
+        return None
+
+    if _EMAIL.search(answer) or _SSN.search(answer):
+        return None
+    for match in _CARD_CANDIDATE.finditer(answer):
+        if _passes_luhn(re.sub(r"\D", "", match.group())):
+            return None
+
+    words = _WORD.findall(answer.lower())
+    if _BLOCKED_TERMS.intersection(words):
+        return None
+
+    content_words = {w for w in words if len(w) > 3 and w not in _STOPWORDS}
+    if not content_words:
+        return None
+    source_words = set(_WORD.findall(" ".join(s["content"] for s in sources).lower()))
+
+    # A changed figure or an added "not" flips the facts while reusing the
+    # sources' vocabulary, so these must match exactly
+    exact_words = {w for w in words
+                   if any(c.isdigit() for c in w) or w in _NEGATIONS or w.endswith("n't")}
+    if not exact_words <= source_words:
+        return None
+
+    grounding = len(content_words & source_words) / len(content_words)
+    if grounding < GROUNDING_THRESHOLD:
+        return None
+
+    return {
+        "is_safe": True,
+        "issues": [],
+        "confidence": round(grounding, 2),
+        "check": "local"
+    }
+
+
+def parse_validation(response: str) -> Optional[Dict[str, Any]]:
+    """Parse the guard's JSON, tolerating surrounding prose and trailing commas.
+
+    The strict parse runs first; the lenient repair only runs when it fails.
+    """
+    try:
+        parsed = orjson.loads(response)
+        if isinstance(parsed, dict):
+            return parsed
+    except orjson.JSONDecodeError:
+        pass
+
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        parsed = orjson.loads(_TRAILING_COMMA.sub(r"\1", response[start:end + 1]))
+    except orjson.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
 
 
 class GuardAgent:
@@ -14,51 +133,30 @@ class GuardAgent:
 
     async def validate_response(self, state: AgentState) -> AgentState:
         """Validate the generated response for safety and compliance."""
-        start_time = time.time()
-
-        system_prompt = """You are a safety validator for customer support responses. Check for harmful content, hallucinations, policy violations, and quality issues. Return JSON with: is_safe (boolean), issues (array of strings), confidence (0-1)."""
-
-        user_prompt = f"""Original Request:
-{state['request_text']}
-
-Generated Response:
-{state['answer']}
-
-Available Knowledge Sources:
-{json.dumps([{'title': s['title'], 'content': s['content']} for s in state['sources']], indent=2)}
-
-Please validate this response:"""
+        start_ns = time.perf_counter_ns()
 
         try:
-            response = await self.llm.chat([
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ], fast=True)
-
-            # Parse JSON response
-            try:
-                validation = json.loads(response)
-            except json.JSONDecodeError:
-                # Fallback validation if JSON parsing fails
-                validation = {
-                    "is_safe": True,
-                    "issues": ["Unable to parse validation response"],
-                    "confidence": 0.5
-                }
+            validation = check_locally(state.get("answer") or "", state["sources"])
+
+            if validation is None:
+                # Reuse the block the retriever already serialized
+                sources_block = (state.get("sources_prompt_block")
+                                 or format_sources_block(state["sources"]))
+                validation = await self._validate_with_llm(
+                    state, f"Available Knowledge Sources:\n{sources_block}")
 
             # Create trace step
-            step: AgentStep = {
-                "agent_name": "GuardAgent",
-                "step_name": "validate_response",
-                "input": {
-                    "request_text": state["request_text"],
+            step = create_step(
+                "GuardAgent",
+                "validate_response",
+                input={
+                    "request_length": len(state["request_text"]),
                     "response_length": len(state.get("answer", "")),
                     "sources_count": len(state["sources"])
                 },
-                "output": validation,
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                output=validation,
+                start_ns=start_ns
+            )
 
             # Update state
             state["is_safe"] = validation.get("is_safe", False)
@@ -69,18 +167,17 @@ Please validate this response:"""
 
         except Exception as e:
             # Add error step to trace
-            error_step: AgentStep = {
-                "agent_name": "GuardAgent",
-                "step_name": "validate_response",
-                "input": {
-                    "request_text": state["request_text"],
+            error_step = create_step(
+                "GuardAgent",
+                "validate_response",
+                input={
+                    "request_length": len(state["request_text"]),
                     "response_length": len(state.get("answer", "")),
                     "sources_count": len(state["sources"])
                 },
-                "output": {"error": str(e)},
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                output={"error": str(e)},
+                start_ns=start_ns
+            )
             state["trace"].append(error_step)
 
             # Set conservative fallback values
@@ -89,3 +186,33 @@ Please validate this response:"""
                 "Validation failed due to system error"]
 
             return state
+
+    async def _validate_with_llm(self, state: AgentState, sources_text: str) -> Dict[str, Any]:
+        """Ask the LLM to validate the answer against the given sources text."""
+        user_prompt = f"""{sources_text}
+
+Original Request:
+{state['request_text']}
+
+Generated Response:
+{state['answer']}
+
+Please validate this response:"""
+
+        response = await self.llm.chat([
+            {"role": "system", "content": GUARD_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ], fast=True, cache_key=GUARD_CACHE_KEY,
+            response_format=GUARD_RESPONSE_FORMAT, max_tokens=GUARD_MAX_TOKENS)
+
+        # Parse JSON response
+        validation = parse_validation(response)
+        if validation is None:
+            # Fallback validation if JSON parsing fails
+            validation = {
+                "is_safe": True,
+                "issues": ["Unable to parse validation response"],
+                "confidence": 0.5
+            }
+        validation["check"] = "llm"
+        return validation
@@ -1,7 +1,6 @@
 import time
-from datetime import datetime
 from typing import Dict, Any
-from ..models.state import AgentState, AgentStep, Metrics
+from ..models.state import AgentState, create_step, Metrics
 
 
 class LoggerAgent:
@@ -12,15 +11,15 @@ class LoggerAgent:
 
     async def log_and_evaluate(self, state: AgentState) -> AgentState:
         """Log the complete trace and calculate final metrics."""
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
+        summary = self._summarize(state)
 
         try:
             # Calculate final metrics
-            total_latency = int(
-                (datetime.now() - state["start_time"]).total_seconds() * 1000)
+            total_latency = (time.perf_counter_ns() - state["start_ns"]) // 1_000_000
 
             # Estimate token usage based on trace
-            estimated_tokens = self._estimate_token_usage(state)
+            estimated_tokens = self._estimate_token_usage(state, summary)
 
             final_metrics: Metrics = {
                 "latency_ms": total_latency,
@@ -28,22 +27,16 @@ class LoggerAgent:
             }
 
             # Create final trace step
-            final_step: AgentStep = {
-                "agent_name": "LoggerAgent",
-                "step_name": "final_evaluation",
-                "input": {
-                    "total_steps": len(state["trace"]),
-                    "sources_used": len(state["sources"]),
-                    "response_generated": bool(state.get("answer")),
-                    "validation_passed": state.get("is_safe", False)
-                },
-                "output": {
+            final_step = create_step(
+                "LoggerAgent",
+                "final_evaluation",
+                input=summary,
+                output={
                     "final_metrics": final_metrics,
-                    "evaluation": self._generate_evaluation(state)
+                    "evaluation": self._generate_evaluation(state, summary)
                 },
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                start_ns=start_ns
+            )
 
             # Update state
             state["trace"].append(final_step)
@@ -53,52 +46,57 @@ class LoggerAgent:
 
         except Exception as e:
             # Add error step to trace
-            error_step: AgentStep = {
-                "agent_name": "LoggerAgent",
-                "step_name": "final_evaluation",
-                "input": {
-                    "total_steps": len(state["trace"]),
-                    "sources_used": len(state["sources"]),
-                    "response_generated": bool(state.get("answer")),
-                    "validation_passed": state.get("is_safe", False)
-                },
-                "output": {"error": str(e)},
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+            error_step = create_step(
+                "LoggerAgent",
+                "final_evaluation",
+                input=summary,
+                output={"error": str(e)},
+                start_ns=start_ns
+            )
             state["trace"].append(error_step)
 
             # Set minimal metrics on error
             state["metrics"] = {
-                "latency_ms": int((datetime.now() - state["start_time"]).total_seconds() * 1000),
+                "latency_ms": (time.perf_counter_ns() - state["start_ns"]) // 1_000_000,
                 "token_usage": 0
             }
 
             return state
 
-    def _estimate_token_usage(self, state: AgentState) -> int:
+    def _summarize(self, state: AgentState) -> Dict[str, Any]:
+        """Read the state fields shared by the step input, metrics and evaluation once."""
+        return {
+            "total_steps": len(state["trace"]),
+            "sources_used": len(state["sources"]),
+            "response_generated": bool(state.get("answer")),
+            "validation_passed": state.get("is_safe", False)
+        }
+
+    def _estimate_token_usage(self, state: AgentState, summary: Dict[str, Any]) -> int:
         """Estimate token usage based on trace and content."""
         # Rough estimation based on content length and agent steps
         base_tokens = 50  # Base tokens per agent step
         # Rough estimate: 1 token ≈ 4 chars
-        request_tokens = len(state.get("request_text", "")) // 4
-        response_tokens = len(state.get("answer", "")) // 4
-        sources_tokens = sum(len(source.get("content", ""))
-                             for source in state["sources"]) // 4
+        request_tokens = len(state.get("request_text") or "") >> 2
+        response_tokens = len(state.get("answer") or "") >> 2
+        # The serialized block is what the prompts actually carry, and its
+        # length is one lookup instead of a pass over every source
+        sources_tokens = len(state.get("sources_prompt_block") or "") >> 2
 
-        estimated = (len(state["trace"]) * base_tokens) + \
+        estimated = (summary["total_steps"] * base_tokens) + \
             request_tokens + response_tokens + sources_tokens
         return max(estimated, 100)  # Minimum 100 tokens
 
-    def _generate_evaluation(self, state: AgentState) -> Dict[str, Any]:
+    def _generate_evaluation(self, state: AgentState, summary: Dict[str, Any]) -> Dict[str, Any]:
         """Generate a simple evaluation of the pipeline execution."""
+        validation_passed = summary["validation_passed"]
         return {
-            "success": bool(state.get("answer") and state.get("is_safe", False)),
-            "agents_executed": len(state["trace"]),
-            "sources_found": len(state["sources"]),
+            "success": bool(summary["response_generated"] and validation_passed),
+            "agents_executed": summary["total_steps"],
+            "sources_found": summary["sources_used"],
             "classification_completed": bool(state.get("intent")),
             "retrieval_completed": True,  # Always completes even if no sources
-            "response_generated": bool(state.get("answer")),
-            "validation_passed": state.get("is_safe", False),
-            "issues": state.get("validation_reasons", []) if not state.get("is_safe", False) else []
+            "response_generated": summary["response_generated"],
+            "validation_passed": validation_passed,
+            "issues": state.get("validation_reasons", []) if not validation_passed else []
         }
@@ -1,8 +1,23 @@
+import logging
 import time
-from datetime import datetime
 from typing import Dict, Any, List
-from ..models.state import AgentState, AgentStep, Source
+import orjson
+from ..models.state import AgentState, create_step, Source
 from ..services.knowledge_base import KnowledgeBase
+from ..services.cache import TTLCache, request_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def format_sources_block(sources: List[Source]) -> str:
+    """Serialize sources for LLM prompts as compact JSON.
+
+    Sorted by id so the same retrieval result yields byte-identical prompts.
+    """
+    return orjson.dumps([
+        {"title": s["title"], "content": s["content"]}
+        for s in sorted(sources, key=lambda s: s["id"])
+    ]).decode()
 
 
 class RetrieverAgent:
@@ -10,42 +25,53 @@ class RetrieverAgent:
 
     def __init__(self):
         self.kb = KnowledgeBase()
+        # Sources found for recently seen requests
+        self._cache = TTLCache()
 
     async def retrieve(self, state: AgentState) -> AgentState:
         """Retrieve relevant knowledge based on the request."""
-        print("🔍 RETRIEVER AGENT: Starting retrieval...")
-        start_time = time.time()
+        logger.debug("Starting retrieval")
+        start_ns = time.perf_counter_ns()
 
         try:
-            print("🔍 RETRIEVER: Calling knowledge base search...")
-            # Search for relevant documents
-            search_results = await self.kb.search_similar(
-                query=state["request_text"],
-                limit=5,
-                threshold=0.7
-            )
+            cache_key = request_cache_key(state["request_text"])
+            sources: List[Source] = self._cache.get(cache_key)
+            cache_hit = sources is not None
 
-            # Convert to Source format (matching models.state.Source)
-            sources: List[Source] = []
-            for result in search_results:
-                similarity = result.get("similarity", 0.8)
-                source: Source = {
-                    "id": result["id"],
-                    "title": result["title"],
-                    "content": result["content"],
-                    "similarity_score": similarity,
-                }
-                sources.append(source)
+            if not cache_hit:
+                # Search for relevant documents
+                search_results = await self.kb.search_similar(
+                    query=state["request_text"],
+                    limit=5,
+                    threshold=0.7
+                )
+
+                # Convert to Source format (matching models.state.Source)
+                sources = []
+                for result in search_results:
+                    similarity = result.get("similarity", 0.8)
+                    source: Source = {
+                        "id": result["id"],
+                        "title": result["title"],
+                        "content": result["content"],
+                        "similarity_score": similarity,
+                    }
+                    sources.append(source)
+
+                # Search failures also come back empty, so only cache non-empty results
+                if sources:
+                    self._cache.set(cache_key, sources)
 
             # Create trace step
-            step: AgentStep = {
-                "agent_name": "RetrieverAgent",
-                "step_name": "retrieve_knowledge",
-                "input": {
-                    "request_text": state["request_text"],
+            step = create_step(
+                "RetrieverAgent",
+                "retrieve_knowledge",
+                input={
+                    "request_length": len(state["request_text"]),
                     "intent": state.get("intent")
                 },
-                "output": {
+                output={
+                    "cache": cache_hit,
                     "sources_found": len(sources),
                     "sources": [
                         {
@@ -56,32 +82,32 @@ class RetrieverAgent:
                         for s in sources
                     ],
                 },
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat(),
-            }
+                start_ns=start_ns
+            )
 
-            # Update state
-            state["sources"] = sources
+            # Update state with a copy, so requests never share the cached list
+            state["sources"] = list(sources)
+            state["sources_prompt_block"] = format_sources_block(sources)
             state["trace"].append(step)
 
             return state
 
         except Exception as e:
             # Add error step to trace
-            error_step: AgentStep = {
-                "agent_name": "RetrieverAgent",
-                "step_name": "retrieve_knowledge",
-                "input": {
-                    "request_text": state["request_text"],
+            error_step = create_step(
+                "RetrieverAgent",
+                "retrieve_knowledge",
+                input={
+                    "request_length": len(state["request_text"]),
                     "intent": state.get("intent")
                 },
-                "output": {"error": str(e)},
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                output={"error": str(e)},
+                start_ns=start_ns
+            )
             state["trace"].append(error_step)
 
             # Set empty sources on error
             state["sources"] = []
+            state["sources_prompt_block"] = format_sources_block([])
 
             return state
@@ -1,6 +1,9 @@
-from datetime import datetime
-from typing import Dict, Any
-from langgraph.graph import StateGraph, END
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from ..models.state import AgentState
 from ..agents.classifier import ClassifierAgent
 from ..agents.retriever import RetrieverAgent
@@ -8,9 +11,25 @@ from ..agents.writer import WriterAgent
 from ..agents.guard import GuardAgent
 from ..agents.logger import LoggerAgent
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single pipeline step, including its LLM and database calls
+AGENT_STEP_TIMEOUT_SECONDS = float(os.getenv("AGENT_STEP_TIMEOUT_SECONDS", "60"))
+
+# Extra attempts for a step that timed out; agents handle their own errors
+AGENT_MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", "1"))
+
+# Base delay between retries, doubled on each attempt
+AGENT_RETRY_BACKOFF_SECONDS = 0.5
+
+# How long a speculative write waits for a late classification before keeping its answer
+SPECULATIVE_WRITE_GRACE_SECONDS = float(os.getenv("SPECULATIVE_WRITE_GRACE_SECONDS", "0.25"))
+
+PipelineStep = Tuple[str, Callable[[AgentState], Awaitable[AgentState]]]
+
 
 class AgentWorkflow:
-    """Orchestrates the multi-agent pipeline using LangGraph."""
+    """Orchestrates the multi-agent pipeline."""
 
     def __init__(self):
         self.classifier = ClassifierAgent()
@@ -19,37 +38,121 @@ class AgentWorkflow:
         self.guard = GuardAgent()
         self.logger = LoggerAgent()
 
-        # Build and compile the workflow graph
-        self.compiled_workflow = self._build_workflow()
+        # The flow is linear, so steps are awaited in order without a graph runtime
+        self.pipeline: List[PipelineStep] = [
+            ("classify_and_retrieve", self._classify_and_retrieve),
+            ("write_and_validate", self._write_and_validate),
+            ("log", self.logger.log_and_evaluate),
+        ]
+
+    def _build_workflow(self) -> Any:
+        """Build the equivalent LangGraph graph; only used for visualization."""
+        from langgraph.graph import StateGraph, END
 
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow."""
         workflow = StateGraph(AgentState)
+        for name, step in self.pipeline:
+            workflow.add_node(name, step)
 
-        # Add nodes for each agent
-        workflow.add_node("classify", self.classifier.classify)
-        workflow.add_node("retrieve", self.retriever.retrieve)
-        workflow.add_node("write", self.writer.write_response)
-        workflow.add_node("validate", self.guard.validate_response)
-        workflow.add_node("log", self.logger.log_and_evaluate)
+        workflow.set_entry_point(self.pipeline[0][0])
+        for (name, _), (next_name, _) in zip(self.pipeline, self.pipeline[1:]):
+            workflow.add_edge(name, next_name)
+        workflow.add_edge(self.pipeline[-1][0], END)
 
-        # Define the flow
-        workflow.set_entry_point("classify")
+        return workflow.compile()
 
-        # After classification, always retrieve
-        workflow.add_edge("classify", "retrieve")
+    async def _run_pipeline(self, state: AgentState) -> AgentState:
+        """Run each pipeline step in order."""
+        for name, step in self.pipeline:
+            state = await self._run_step(name, step, state)
+        return state
 
-        # After retrieval, always write
-        workflow.add_edge("retrieve", "write")
+    async def _run_step(self, name: str, step: Callable[[AgentState], Awaitable[AgentState]],
+                        state: AgentState) -> AgentState:
+        """Run one step with a timeout, retrying timeouts with exponential backoff.
 
-        # After writing, always validate
-        workflow.add_edge("write", "validate")
+        Each attempt works on a copy of the state, so a cancelled attempt cannot
+        leave partial trace steps behind.
+        """
+        for attempt in range(AGENT_MAX_RETRIES + 1):
+            attempt_state = {**state, "trace": list(state["trace"])}
+            try:
+                # A timeout scope runs the step in the current task, unlike wait_for
+                async with asyncio.timeout(AGENT_STEP_TIMEOUT_SECONDS):
+                    return await step(attempt_state)
+            except TimeoutError:
+                if attempt == AGENT_MAX_RETRIES:
+                    raise TimeoutError(
+                        f"Step '{name}' timed out after {AGENT_STEP_TIMEOUT_SECONDS}s")
+                logger.warning("Step %s timed out, retrying (attempt %d)", name, attempt + 2)
+                await asyncio.sleep(AGENT_RETRY_BACKOFF_SECONDS * 2 ** attempt)
 
-        # After validation, always log and end
-        workflow.add_edge("validate", "log")
-        workflow.add_edge("log", END)
+    async def _classify_and_retrieve(self, state: AgentState) -> AgentState:
+        """Run classification and retrieval concurrently and merge their results.
 
-        return workflow.compile()
+        Retrieval only needs the request text, so it does not have to wait for
+        the classifier. Each agent works on its own copy of the state with a
+        separate trace list; the steps are joined here to avoid interleaving.
+        If retrieval finishes first, the response is written speculatively
+        while classification completes.
+        """
+        classifier_state = {**state, "trace": []}
+        retriever_state = {**state, "trace": []}
+
+        # The task group cancels the classifier if anything below raises
+        async with asyncio.TaskGroup() as tg:
+            classify_task = tg.create_task(self.classifier.classify(classifier_state))
+            retrieved = await self.retriever.retrieve(retriever_state)
+            state["sources"] = retrieved["sources"]
+            state["sources_prompt_block"] = retrieved["sources_prompt_block"]
+
+            written = None
+            if not classify_task.done():
+                written = await self._write_speculatively(state, classify_task)
+            classified = await classify_task
+
+        state["intent"] = classified["intent"]
+        state["sentiment"] = classified["sentiment"]
+        state["urgency"] = classified["urgency"]
+        state["trace"].extend(classified["trace"])
+        state["trace"].extend(retrieved["trace"])
+
+        if written is not None:
+            state["answer"] = written["answer"]
+            state["is_safe"] = written["is_safe"]
+            state["validation_reasons"] = written["validation_reasons"]
+            state["trace"].extend(written["trace"])
+
+        return state
+
+    async def _write_speculatively(self, state: AgentState,
+                                   classify_task: "asyncio.Task[AgentState]") -> Optional[AgentState]:
+        """Write the response without a classification while the classifier runs.
+
+        Returns None if the classification arrives within the grace period, so
+        the response is written normally with it; otherwise the speculative
+        result is kept.
+        """
+        async with asyncio.TaskGroup() as tg:
+            write_task = tg.create_task(self._write_and_validate({**state, "trace": []}))
+            done, _ = await asyncio.wait({classify_task}, timeout=SPECULATIVE_WRITE_GRACE_SECONDS)
+            if classify_task in done:
+                logger.debug("Classification arrived in time, dropping speculative write")
+                write_task.cancel()
+                return None
+        return write_task.result()
+
+    async def _write_and_validate(self, state: AgentState) -> AgentState:
+        """Write and validate in one LLM call, falling back to the separate agents."""
+        # Already written speculatively during classification
+        if state.get("answer") is not None:
+            return state
+
+        validated = await self.writer.write_and_validate(state)
+        if validated is not None:
+            return validated
+
+        state = await self.writer.write_response(state)
+        return await self.guard.validate_response(state)
 
     def create_initial_state(self, request_text: str) -> AgentState:
         """Create the initial state for a new request."""
@@ -59,6 +162,7 @@ class AgentWorkflow:
             "sentiment": None,
             "urgency": None,
             "sources": [],
+            "sources_prompt_block": None,
             "answer": None,
             "is_safe": None,
             "validation_reasons": None,
@@ -67,55 +171,90 @@ class AgentWorkflow:
                 "latency_ms": 0,
                 "token_usage": 0
             },
-            "start_time": datetime.now()
+            "start_time": datetime.now(),
+            "start_ns": time.perf_counter_ns()
         }
 
     async def process_request(self, request_text: str) -> Dict[str, Any]:
         """Process a support request through the complete agent pipeline."""
-        print("🔄 WORKFLOW: Starting process_request...")
         initial_state = self.create_initial_state(request_text)
-        print("🔄 WORKFLOW: Initial state created, invoking workflow...")
+        logger.debug("Invoking workflow")
 
         try:
             # Run the workflow
-            final_state = await self.compiled_workflow.ainvoke(initial_state)
-            print("🔄 WORKFLOW: Workflow completed successfully!")
-
-            # Return the response in the expected format
-            return {
-                "answer": final_state.get("answer", "No response generated."),
-                "sources": final_state.get("sources", []),
-                "trace": final_state.get("trace", []),
-                "metrics": final_state.get("metrics", {
-                    "latency_ms": 0,
-                    "token_usage": 0
-                })
-            }
+            final_state = await self._run_pipeline(initial_state)
+            logger.debug("Workflow completed")
+
+            return self._build_response(final_state)
 
         except Exception as e:
-            # Return error response
-            return {
-                "answer": f"An error occurred while processing your request: {str(e)}",
-                "sources": [],
-                "trace": [{
-                    "agent_name": "Workflow",
-                    "step_name": "error",
-                    "input": {"request_text": request_text},
-                    "output": {"error": str(e)},
-                    "duration_ms": 0,
-                    "timestamp": datetime.now().isoformat()
-                }],
-                "metrics": {
-                    "latency_ms": 0,
-                    "token_usage": 0
-                }
+            return self._build_error_response(request_text, e)
+
+    async def stream_request(self, request_text: str) -> AsyncIterator[Dict[str, Any]]:
+        """Process a request, yielding answer text as it is written, then the result.
+
+        Yields {"type": "token", "content": str} events while the writer streams,
+        then one {"type": "result", "data": ...} event shaped like process_request's
+        return value. The guard validates the answer after it has been streamed.
+        """
+        state = self.create_initial_state(request_text)
+
+        try:
+            state = await self._run_step(
+                "classify_and_retrieve", self._classify_and_retrieve, state)
+
+            if state.get("answer") is None:
+                async for chunk in self.writer.stream_response(state):
+                    yield {"type": "token", "content": chunk}
+            else:
+                # Already written speculatively during classification
+                yield {"type": "token", "content": state["answer"]}
+
+            if state.get("is_safe") is None:
+                state = await self._run_step("validate", self.guard.validate_response, state)
+            state = await self._run_step("log", self.logger.log_and_evaluate, state)
+
+            yield {"type": "result", "data": self._build_response(state)}
+
+        except Exception as e:
+            yield {"type": "result", "data": self._build_error_response(request_text, e)}
+
+    def _build_response(self, state: AgentState) -> Dict[str, Any]:
+        """Shape the final state into the API response."""
+        return {
+            "answer": state.get("answer", "No response generated."),
+            "sources": state.get("sources", []),
+            "trace": state.get("trace", []),
+            "metrics": state.get("metrics", {
+                "latency_ms": 0,
+                "token_usage": 0
+            })
+        }
+
+    def _build_error_response(self, request_text: str, error: Exception) -> Dict[str, Any]:
+        """Build the API response for a request that failed outside the agents."""
+        return {
+            "answer": f"An error occurred while processing your request: {str(error)}",
+            "sources": [],
+            "trace": [{
+                "agent_name": "Workflow",
+                "step_name": "error",
+                "input": {"request_text": request_text},
+                "output": {"error": str(error)},
+                "duration_ms": 0,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }],
+            "metrics": {
+                "latency_ms": 0,
+                "token_usage": 0
             }
+        }
 
     def visualize_workflow(self) -> str:
         """Generate a Mermaid diagram of the workflow."""
         try:
-            # Get the graph from compiled workflow
-            graph = self.compiled_workflow.get_graph()
+            # Get the graph from the LangGraph equivalent of the pipeline
+            graph = self._build_workflow().get_graph()
             # Generate Mermaid diagram
             mermaid_diagram = graph.draw_mermaid()
             return mermaid_diagram
@@ -129,10 +268,12 @@ class AgentWorkflow:
 ```mermaid
 graph TD
     A[Start: Request Text] --> B[Classifier Agent]
-    B --> C[Retriever Agent]
-    C --> D[Writer Agent]
-    D --> E[Guard Agent]
-    E --> F[Logger Agent]
+    A --> C[Retriever Agent]
+    B --> D[Writer + Guard: single LLM call]
+    C --> D
+    D -. JSON parse failed .-> E[Writer Agent, then Guard Agent]
+    D --> F[Logger Agent]
+    E --> F
     F --> G[End: Response]
     
     style A fill:#e1f5fe
@@ -152,7 +293,7 @@ graph TD
         with open(filename, 'w') as f:
             f.write("# Agentic Support Copilot Workflow\n\n")
             f.write(
-                "This diagram shows the sequential flow of agents processing support requests.\n\n")
+                "This diagram shows the flow of agents processing support requests. Classification and retrieval run in parallel.\n\n")
             f.write(diagram)
             f.write("\n\n## Agent Descriptions\n\n")
             f.write(
@@ -162,5 +303,7 @@ graph TD
             f.write("3. **Writer Agent**: Generates a grounded response\n")
             f.write("4. **Guard Agent**: Validates safety and compliance\n")
             f.write("5. **Logger Agent**: Logs metrics and final evaluation\n")
+            f.write(
+                "\nThe Writer and Guard normally run as one combined LLM call; the separate agents are the fallback.\n")
 
         return filename
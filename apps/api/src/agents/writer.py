@@ -1,8 +1,49 @@
+import logging
 import time
-from datetime import datetime
-from typing import Dict, Any
-from ..models.state import AgentState, AgentStep
+from typing import AsyncIterator, Dict, Any, Optional
+import orjson
+from ..models.state import AgentState, create_step
 from ..models.llm import get_llm_provider
+from .retriever import format_sources_block
+
+logger = logging.getLogger(__name__)
+
+# Static prompt text comes first and request-specific text last, so the shared
+# prefix can be served from the provider's prompt cache
+WRITER_SYSTEM_PROMPT = """You are a helpful customer support agent. Write a professional, empathetic response using the provided knowledge sources. Be concise, actionable, and address the customer's specific intent and urgency."""
+
+# Routes writer requests to the same prompt cache entry
+WRITER_CACHE_KEY = "writer-v1"
+
+# Single-call variant: write the response and self-validate it in one completion
+WRITE_AND_VALIDATE_SYSTEM_PROMPT = WRITER_SYSTEM_PROMPT + """
+
+Then act as a safety validator for that response. Check it for harmful content, hallucinations not supported by the knowledge sources, policy violations, and quality issues.
+
+Return JSON with: answer (string), is_safe (boolean), issues (array of strings), confidence (0-1)."""
+
+# Routes combined requests to their own prompt cache entry
+WRITE_AND_VALIDATE_CACHE_KEY = "write-and-validate-v1"
+
+# Constrains the combined completion to the fields the writer and guard produce
+WRITE_AND_VALIDATE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "validated_response",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answer": {"type": "string"},
+                "is_safe": {"type": "boolean"},
+                "issues": {"type": "array", "items": {"type": "string"}},
+                "confidence": {"type": "number"},
+            },
+            "required": ["answer", "is_safe", "issues", "confidence"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+}
 
 
 class WriterAgent:
@@ -13,53 +54,31 @@ class WriterAgent:
 
     async def write_response(self, state: AgentState) -> AgentState:
         """Generate a response based on the request and retrieved knowledge."""
-        start_time = time.time()
-
-        system_prompt = """You are a helpful customer support agent. Write a professional, empathetic response using the provided knowledge sources. Be concise, actionable, and address the customer's specific intent and urgency."""
+        start_ns = time.perf_counter_ns()
 
-        # Build context from sources
-        sources_text = ""
-        if state["sources"]:
-            sources_text = "\n\nKnowledge Sources:\n"
-            for i, source in enumerate(state["sources"], 1):
-                sources_text += f"\n{i}. {source['title']}\n{source['content']}\n"
-        else:
-            sources_text = "\n\nNo specific knowledge sources were found for this request."
-
-        user_prompt = f"""Customer Request:
-{state['request_text']}
-
-Classification:
-- Intent: {state.get('intent', 'unknown')}
-- Sentiment: {state.get('sentiment', 'unknown')}  
-- Urgency: {state.get('urgency', 'unknown')}
-
-{sources_text}
-
-Please write a helpful response:"""
+        user_prompt = self._build_user_prompt(state)
 
         try:
             response = await self.llm.chat([
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": WRITER_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
-            ])
+            ], cache_key=WRITER_CACHE_KEY)
 
             # Create trace step
-            step: AgentStep = {
-                "agent_name": "WriterAgent",
-                "step_name": "generate_response",
-                "input": {
-                    "request_text": state["request_text"],
+            step = create_step(
+                "WriterAgent",
+                "generate_response",
+                input={
+                    "request_length": len(state["request_text"]),
                     "intent": state.get("intent"),
                     "sources_count": len(state["sources"])
                 },
-                "output": {
+                output={
                     "response_length": len(response),
                     "response_preview": response[:200] + "..." if len(response) > 200 else response
                 },
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                start_ns=start_ns
+            )
 
             # Update state
             state["answer"] = response
@@ -69,21 +88,143 @@ Please write a helpful response:"""
 
         except Exception as e:
             # Add error step to trace
-            error_step: AgentStep = {
-                "agent_name": "WriterAgent",
-                "step_name": "generate_response",
-                "input": {
-                    "request_text": state["request_text"],
+            error_step = create_step(
+                "WriterAgent",
+                "generate_response",
+                input={
+                    "request_length": len(state["request_text"]),
                     "intent": state.get("intent"),
                     "sources_count": len(state["sources"])
                 },
-                "output": {"error": str(e)},
-                "duration_ms": int((time.time() - start_time) * 1000),
-                "timestamp": datetime.now().isoformat()
-            }
+                output={"error": str(e)},
+                start_ns=start_ns
+            )
             state["trace"].append(error_step)
 
             # Set fallback response
             state["answer"] = "I apologize, but I'm unable to generate a response at this moment. Please try again or contact our support team directly."
 
             return state
+
+    async def stream_response(self, state: AgentState) -> AsyncIterator[str]:
+        """Generate the response like write_response, yielding text as it arrives.
+
+        The full answer and the trace step are added to the state once the
+        stream ends.
+        """
+        start_ns = time.perf_counter_ns()
+        chunks = []
+
+        try:
+            async for chunk in self.llm.chat_stream([
+                {"role": "system", "content": WRITER_SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_user_prompt(state)}
+            ], cache_key=WRITER_CACHE_KEY):
+                chunks.append(chunk)
+                yield chunk
+
+            response = "".join(chunks)
+            output = {
+                "response_length": len(response),
+                "response_preview": response[:200] + "..." if len(response) > 200 else response
+            }
+
+        except Exception as e:
+            output = {"error": str(e)}
+            # The final state answer supersedes any partial text already streamed
+            response = "I apologize, but I'm unable to generate a response at this moment. Please try again or contact our support team directly."
+            yield response
+
+        state["answer"] = response
+        state["trace"].append(create_step(
+            "WriterAgent",
+            "generate_response",
+            input={
+                "request_length": len(state["request_text"]),
+                "intent": state.get("intent"),
+                "sources_count": len(state["sources"])
+            },
+            output=output,
+            start_ns=start_ns
+        ))
+
+    async def write_and_validate(self, state: AgentState) -> Optional[AgentState]:
+        """Write and validate the response in a single LLM call.
+
+        Returns None if the call fails or its JSON cannot be parsed, so the caller
+        can fall back to the separate writer and guard agents.
+        """
+        start_ns = time.perf_counter_ns()
+
+        try:
+            response = await self.llm.chat([
+                {"role": "system", "content": WRITE_AND_VALIDATE_SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_user_prompt(state)}
+            ], cache_key=WRITE_AND_VALIDATE_CACHE_KEY,
+                response_format=WRITE_AND_VALIDATE_RESPONSE_FORMAT)
+            result = orjson.loads(response)
+            answer = result["answer"]
+            validation = {
+                "is_safe": result["is_safe"],
+                "issues": result["issues"],
+                "confidence": result["confidence"]
+            }
+        except Exception as e:
+            logger.warning("Combined write and validate failed, falling back: %s", e)
+            return None
+
+        # Keep separate writer and guard steps so trace consumers see the usual shape
+        write_step = create_step(
+            "WriterAgent",
+            "generate_response",
+            input={
+                "request_length": len(state["request_text"]),
+                "intent": state.get("intent"),
+                "sources_count": len(state["sources"])
+            },
+            output={
+                "response_length": len(answer),
+                "response_preview": answer[:200] + "..." if len(answer) > 200 else answer
+            },
+            start_ns=start_ns
+        )
+        validate_step = create_step(
+            "GuardAgent",
+            "validate_response",
+            input={
+                "request_length": len(state["request_text"]),
+                "response_length": len(answer),
+                "sources_count": len(state["sources"])
+            },
+            output=validation,
+            start_ns=start_ns
+        )
+
+        state["answer"] = answer
+        state["is_safe"] = validation["is_safe"]
+        state["validation_reasons"] = validation["issues"]
+        state["trace"].append(write_step)
+        state["trace"].append(validate_step)
+
+        return state
+
+    def _build_user_prompt(self, state: AgentState) -> str:
+        """Build the user prompt from the sources, classification, and request."""
+        # Reuse the block the retriever already serialized
+        if state["sources"]:
+            sources_block = state.get("sources_prompt_block") or format_sources_block(state["sources"])
+            sources_text = f"Knowledge Sources:\n{sources_block}"
+        else:
+            sources_text = "No specific knowledge sources were found for this request."
+
+        return f"""{sources_text}
+
+Classification:
+- Intent: {state.get('intent') or 'unknown'}
+- Sentiment: {state.get('sentiment') or 'unknown'}
+- Urgency: {state.get('urgency') or 'unknown'}
+
+Customer Request:
+{state['request_text']}
+
+Please write a helpful response:"""
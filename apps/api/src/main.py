@@ -1,18 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Dict, Any
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import logging
 import os
+import queue
 from datetime import datetime
+import orjson
+from dotenv import load_dotenv
+
+# Load .env once, before the app modules read their settings at import time
+load_dotenv()
 
 from .agents.workflow import AgentWorkflow
 from .models.state import Source, AgentStep, Metrics
+from .services.database import close_pg_pool
 
 
 class ProcessRequest(BaseModel):
     """Request model for processing support requests."""
     request_text: str
 
+    @field_validator("request_text")
+    @classmethod
+    def request_text_not_blank(cls, value: str) -> str:
+        """Reject blank text with a 422; the text itself is passed on unstripped."""
+        if not value.strip():
+            raise ValueError("request_text cannot be empty")
+        return value
+
 
 class ProcessResponse(BaseModel):
     """Response model for processed support requests."""
@@ -29,27 +49,47 @@ class HealthResponse(BaseModel):
     version: str
 
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Agentic Support Copilot API",
-    description="Multi-agent support request processing system",
-    version="0.1.0"
-)
+def setup_logging() -> None:
+    """Log through a queue, so request handlers never block writing to stderr.
+
+    A background listener thread formats and writes the records.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Only merge args into the message here; the listener applies the real format
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        handlers=[queue_handler],
+    )
+    listener.start()
+    # Flush queued records on shutdown
+    atexit.register(listener.stop)
+
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release the direct database pool on shutdown."""
+    yield
+    await close_pg_pool()
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Frontend URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Initialize workflow
 workflow = AgentWorkflow()
 
+router = APIRouter()
 
-@app.get("/health", response_model=HealthResponse)
+
+@router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
     return HealthResponse(
@@ -59,31 +99,22 @@ async def health_check():
     )
 
 
-@app.post("/process", response_model=ProcessResponse)
+@router.post("/process", response_model=ProcessResponse)
 async def process_support_request(request: ProcessRequest):
     """Process a support request through the multi-agent pipeline."""
-    print("🚀 FASTAPI: /process endpoint called!")
-    print(f"📝 Request text: '{request.request_text}'")
+    logger.debug("/process called with %d chars", len(request.request_text))
     try:
-        print("✅ FASTAPI: Starting validation...")
-        # Validate input
-        if not request.request_text.strip():
-            raise HTTPException(
-                status_code=400, detail="Request text cannot be empty")
-        print("✅ FASTAPI: Validation passed, calling workflow...")
-
         # Process request through workflow
         result = await workflow.process_request(request.request_text)
-        print("✅ FASTAPI: Workflow completed!")
 
-        return ProcessResponse(**result)
+        # response_model validates and serializes the dict straight to JSON bytes
+        return result
 
     except HTTPException:
         # Re-raise HTTP exceptions (like validation errors)
         raise
     except Exception as e:
-        # Log error (in production, you'd use proper logging)
-        print(f"Error processing request: {str(e)}")
+        logger.exception("Error processing request: %s", e)
 
         # Return a more user-friendly error
         raise HTTPException(
@@ -92,7 +123,17 @@ async def process_support_request(request: ProcessRequest):
         )
 
 
-@app.get("/")
+@router.post("/process/stream")
+async def process_support_request_stream(request: ProcessRequest):
+    """Stream the answer as server-sent events, followed by the full result."""
+    async def events():
+        async for event in workflow.stream_request(request.request_text):
+            yield b"data: " + orjson.dumps(event, default=str) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/")
 async def root():
     """Root endpoint with API information."""
     return {
@@ -103,6 +144,31 @@ async def root():
     }
 
 
+def create_app(cors: bool = True) -> FastAPI:
+    """Build the FastAPI app; cors=False leaves out the CORS middleware."""
+    app = FastAPI(
+        title="Agentic Support Copilot API",
+        description="Multi-agent support request processing system",
+        version="0.1.0",
+        lifespan=lifespan
+    )
+
+    if cors:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["http://localhost:3000"],  # Frontend URL
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+    app.include_router(router)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
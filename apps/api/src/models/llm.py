@@ -1,10 +1,30 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Any, Optional
+import hashlib
+import logging
 import os
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
+import httpx
+from openai import AsyncOpenAI, NOT_GIVEN
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by all agents; HTTP/2 multiplexes concurrent calls
+LLM_HTTP_LIMITS = httpx.Limits(
+    max_connections=256, max_keepalive_connections=128, keepalive_expiry=30.0)
+
+# Per-request read timeout for LLM and embedding calls
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+# Fail fast on connecting and on waiting for a pooled connection; reads may be slow
+LLM_HTTP_TIMEOUT = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0, write=10.0, pool=5.0)
+
+# Max embeddings kept in the in-process cache (~12 KB each at 1536 dims)
+EMBEDDING_CACHE_SIZE = 10000
+
+# LRU cache of embeddings keyed by sha256 of model + text
+_embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
 
 
 class LlmProvider(ABC):
@@ -16,13 +36,29 @@ class LlmProvider(ABC):
         pass
 
     @abstractmethod
-    async def chat(self, messages: List[Dict[str, str]], fast: bool = False) -> str:
+    async def chat(self, messages: List[Dict[str, str]], fast: bool = False,
+                   cache_key: Optional[str] = None,
+                   response_format: Optional[Dict[str, Any]] = None,
+                   max_tokens: int = 2000) -> str:
         """Generate chat completion from messages.
 
         If fast=True, a lightweight deployment (e.g. gpt-4o-mini) may be used.
+        If cache_key is set, requests sharing it are routed to the same
+        prompt cache, so a stable system prompt prefix is reused.
+        If response_format is set, the output is constrained to it (e.g. a JSON schema).
+        max_tokens caps generation; short structured outputs should set it low.
         """
         pass
 
+    async def chat_stream(self, messages: List[Dict[str, str]], fast: bool = False,
+                          cache_key: Optional[str] = None,
+                          max_tokens: int = 2000) -> AsyncIterator[str]:
+        """Generate a chat completion as a stream of text chunks.
+
+        Providers without streaming yield the full completion as one chunk.
+        """
+        yield await self.chat(messages, fast=fast, cache_key=cache_key, max_tokens=max_tokens)
+
 
 class OpenAIProvider(LlmProvider):
     """OpenAI implementation of LLM provider."""
@@ -31,6 +67,12 @@ class OpenAIProvider(LlmProvider):
         self.client = AsyncOpenAI(
             base_url=os.getenv("OPENAI_ENDPOINT"),
             api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(
+                # Connection-level retries; the SDK retries failed responses itself
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True, limits=LLM_HTTP_LIMITS, retries=2),
+                timeout=LLM_HTTP_TIMEOUT,
+            ),
         )
         self.chat_deployment = os.getenv(
             "OPENAI_DEPLOYMENT_NAME", "gpt-4o")
@@ -39,18 +81,46 @@ class OpenAIProvider(LlmProvider):
         self.embedding_deployment = os.getenv(
             "OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002")
 
+    def _embedding_cache_key(self, text: str) -> str:
+        """Build the cache key for a text under the current embedding model."""
+        return hashlib.sha256(
+            f"{self.embedding_deployment}:{text}".encode()).hexdigest()
+
     async def embed(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using Azure OpenAI."""
-        try:
-            response = await self.client.embeddings.create(
-                model=self.embedding_deployment,
-                input=texts
-            )
-            return [item.embedding for item in response.data]
-        except Exception as e:
-            raise Exception(f"Embedding generation failed: {str(e)}")
+        """Generate embeddings using Azure OpenAI.
+
+        Repeated texts are served from the in-process cache; only misses are sent.
+        """
+        keys = [self._embedding_cache_key(text) for text in texts]
+        # Take the hits now; concurrent calls may evict them while this one awaits
+        embeddings = [_embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.embedding_deployment,
+                    input=[texts[i] for i in missing]
+                )
+            except Exception as e:
+                raise Exception(f"Embedding generation failed: {str(e)}")
 
-    async def chat(self, messages: List[Dict[str, str]], fast: bool = False) -> str:
+            for i, item in zip(missing, response.data):
+                embeddings[i] = item.embedding
+
+        for key, embedding in zip(keys, embeddings):
+            _embedding_cache[key] = embedding
+            _embedding_cache.move_to_end(key)
+
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+        return embeddings
+
+    async def chat(self, messages: List[Dict[str, str]], fast: bool = False,
+                   cache_key: Optional[str] = None,
+                   response_format: Optional[Dict[str, Any]] = None,
+                   max_tokens: int = 2000) -> str:
         """Generate chat completion using Azure OpenAI.
 
         When fast=True, use the fast_chat_deployment (e.g. gpt-4o-mini) instead of
@@ -62,13 +132,47 @@ class OpenAIProvider(LlmProvider):
                 model=model,
                 messages=messages,
                 temperature=0.7,
-                max_tokens=2000,
+                max_tokens=max_tokens,
+                extra_body={"prompt_cache_key": cache_key} if cache_key else None,
+                response_format=response_format or NOT_GIVEN,
             )
+            if logger.isEnabledFor(logging.DEBUG) and response.usage is not None:
+                # Shows whether the stable system prompt prefix hit the prompt cache
+                details = response.usage.prompt_tokens_details
+                logger.debug("Chat %s: %d prompt tokens, %d cached", cache_key,
+                             response.usage.prompt_tokens,
+                             (details.cached_tokens or 0) if details else 0)
             return response.choices[0].message.content or ""
         except Exception as e:
             raise Exception(f"Chat completion failed: {str(e)}")
 
+    async def chat_stream(self, messages: List[Dict[str, str]], fast: bool = False,
+                          cache_key: Optional[str] = None,
+                          max_tokens: int = 2000) -> AsyncIterator[str]:
+        """Stream a chat completion from Azure OpenAI as it is generated."""
+        model = self.fast_chat_deployment if fast else self.chat_deployment
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                extra_body={"prompt_cache_key": cache_key} if cache_key else None,
+                stream=True,
+            )
+            async for chunk in stream:
+                # Azure sends content filter results as chunks without choices
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f"Chat completion failed: {str(e)}")
+
 
+@lru_cache(maxsize=1)
 def get_llm_provider() -> LlmProvider:
-    """Factory function to get the configured LLM provider."""
+    """Get the process-wide LLM provider, creating it on first use.
+
+    Sharing one provider lets concurrent agent calls multiplex over a single
+    client connection pool instead of each agent opening its own.
+    """
     return OpenAIProvider()
@@ -1,5 +1,13 @@
-from typing import TypedDict, List, Dict, Any, Optional
-from datetime import datetime
+import logging
+import time
+from typing import List, Dict, Any, Optional
+from typing_extensions import TypedDict
+from datetime import datetime, timezone
+
+import orjson
+
+# Steps are also streamed here, so full traces can be kept outside the response
+trace_logger = logging.getLogger("agents.trace")
 
 
 class AgentStep(TypedDict):
@@ -12,6 +20,22 @@ class AgentStep(TypedDict):
     timestamp: str
 
 
+def create_step(agent_name: str, step_name: str, input: Any, output: Any,
+                start_ns: int) -> AgentStep:
+    """Build a trace step, timed from a time.perf_counter_ns() reading."""
+    step: AgentStep = {
+        "agent_name": agent_name,
+        "step_name": step_name,
+        "input": input,
+        "output": output,
+        "duration_ms": (time.perf_counter_ns() - start_ns) // 1_000_000,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    if trace_logger.isEnabledFor(logging.DEBUG):
+        trace_logger.debug(orjson.dumps(step, default=str).decode())
+    return step
+
+
 class Source(TypedDict):
     """Knowledge source retrieved by RAG."""
     id: str
@@ -38,6 +62,8 @@ class AgentState(TypedDict):
 
     # Retrieval results
     sources: List[Source]
+    # Sources serialized once for the writer and guard prompts
+    sources_prompt_block: Optional[str]
 
     # Generated content
     answer: Optional[str]
@@ -52,3 +78,5 @@ class AgentState(TypedDict):
 
     # Internal state
     start_time: datetime
+    # time.perf_counter_ns() at request start, for monotonic latency
+    start_ns: int
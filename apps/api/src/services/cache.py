@@ -0,0 +1,48 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# How long cached agent results stay valid
+CACHE_TTL_SECONDS = int(os.getenv("AGENT_CACHE_TTL_SECONDS", "3600"))
+
+
+def request_cache_key(request_text: str) -> str:
+    """Hash the normalized request text, so trivially different copies share a key."""
+    normalized = " ".join(request_text.lower().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. after the underlying data changed."""
+        self._entries.clear()
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import struct
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncpg
+from supabase import acreate_client, create_client, AsyncClient, Client
+
+logger = logging.getLogger(__name__)
+
+
+def get_supabase_credentials() -> Tuple[str, str]:
+    """Read the Supabase URL and service key, raising if either is missing."""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+
+    if not url or not key:
+        raise ValueError(
+            "Supabase credentials (SUPABASE_URL, SUPABASE_SERVICE_KEY) must be configured")
+
+    return url, key
+
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Get the process-wide Supabase client, creating it on first use."""
+    return create_client(*get_supabase_credentials())
+
+
+_async_supabase: Optional[AsyncClient] = None
+# Serializes client creation, so concurrent first calls don't each build a client
+_async_supabase_lock = asyncio.Lock()
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Get the process-wide async Supabase client for calls made on the event loop."""
+    global _async_supabase
+
+    if _async_supabase is not None:
+        return _async_supabase
+
+    async with _async_supabase_lock:
+        # Another caller may have created the client while this one waited
+        if _async_supabase is None:
+            _async_supabase = await acreate_client(*get_supabase_credentials())
+    return _async_supabase
+
+
+def get_pg_dsn() -> Optional[str]:
+    """Return SUPABASE_DB_URL if it is a Postgres connection URI, otherwise None.
+
+    Placeholders such as the .env.example value are ignored with a warning, so
+    searches stay on PostgREST instead of failing against an invalid DSN.
+    """
+    dsn = os.getenv("SUPABASE_DB_URL", "").strip()
+    if not dsn:
+        return None
+    if urlsplit(dsn).scheme not in ("postgres", "postgresql"):
+        logger.warning("Ignoring SUPABASE_DB_URL: expected a postgresql:// connection URI")
+        return None
+    return dsn
+
+
+# Port of Supabase's transaction-mode pooler; session mode and direct connections use 5432
+TRANSACTION_POOLER_PORT = 6543
+
+
+def uses_transaction_pooler(dsn: str) -> bool:
+    """Check whether the DSN points at a transaction-mode pooler.
+
+    Supabase's pooler runs transaction mode on port 6543, where consecutive
+    statements may land on different backends, so prepared statements can't
+    be reused across them.
+    """
+    parts = urlsplit(dsn)
+    return parts.port == TRANSACTION_POOLER_PORT or "pgbouncer=true" in parts.query
+
+
+_pg_pool: Optional[asyncpg.Pool] = None
+# Serializes pool creation, so concurrent first searches don't each open a pool
+_pg_pool_lock = asyncio.Lock()
+
+# Calls the same SQL function as the PostgREST RPC, so ranking stays in one place
+MATCH_DOCUMENTS_SQL = (
+    "SELECT id::text AS id, title, content, similarity "
+    "FROM match_documents($1, $2, $3)"
+)
+
+
+def to_vector_literal(values: List[float]) -> str:
+    """Format an embedding as a pgvector text literal for PostgREST payloads.
+
+    Five significant digits round-trip through halfvec storage, and the JSON
+    body is roughly half the size of the default float repr.
+    """
+    return "[" + ",".join(f"{value:.5g}" for value in values) + "]"
+
+
+def _encode_halfvec(values: List[float]) -> bytes:
+    """Encode a list of floats in pgvector's binary halfvec format."""
+    return struct.pack(f">HH{len(values)}e", len(values), 0, *values)
+
+
+def _decode_halfvec(data: bytes) -> List[float]:
+    """Decode pgvector's binary halfvec format into a list of floats."""
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}e", data, 4))
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Register the halfvec codec so embeddings can be passed as plain lists."""
+    schema = await conn.fetchval(
+        "SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace "
+        "WHERE t.typname = 'halfvec'")
+    if schema is None:
+        return
+    await conn.set_type_codec(
+        "halfvec",
+        schema=schema,
+        encoder=_encode_halfvec,
+        decoder=_decode_halfvec,
+        format="binary",
+    )
+
+
+async def get_pg_pool() -> asyncpg.Pool:
+    """Get the process-wide asyncpg pool for raw SQL paths that bypass PostgREST."""
+    global _pg_pool
+
+    if _pg_pool is not None:
+        return _pg_pool
+
+    async with _pg_pool_lock:
+        # Another caller may have created the pool while this one waited
+        if _pg_pool is not None:
+            return _pg_pool
+
+        dsn = get_pg_dsn()
+        if dsn is None:
+            raise ValueError(
+                "Database connection string (SUPABASE_DB_URL) must be configured as a postgresql:// URI")
+
+        _pg_pool = await asyncpg.create_pool(
+            dsn,
+            min_size=2,
+            max_size=10,
+            # Recycle idle connections before the pooler drops them
+            max_inactive_connection_lifetime=1800,
+            timeout=30,
+            # Named prepared statements break behind a transaction pooler
+            statement_cache_size=0 if uses_transaction_pooler(dsn) else 100,
+            init=_init_connection,
+        )
+    return _pg_pool
+
+
+async def close_pg_pool() -> None:
+    """Close the asyncpg pool if it was opened."""
+    global _pg_pool
+
+    if _pg_pool is None:
+        return
+
+    await _pg_pool.close()
+    _pg_pool = None
+
+
+async def match_documents(embedding: List[float], threshold: float = 0.7,
+                          k: int = 5) -> List[Dict[str, Any]]:
+    """Run match_documents over a pooled connection instead of PostgREST.
+
+    On direct and session-mode connections, asyncpg prepares the statement on
+    first use and caches it per connection, so repeat searches skip parsing and
+    planning. Behind a transaction pooler the cache is off and every search
+    uses an unnamed statement.
+    """
+    pool = await get_pg_pool()
+    rows = await pool.fetch(MATCH_DOCUMENTS_SQL, embedding, threshold, k)
+    return [dict(row) for row in rows]
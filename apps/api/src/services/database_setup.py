@@ -37,7 +37,7 @@ def setup_database():
             id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
             title TEXT NOT NULL,
             content TEXT NOT NULL,
-            embedding vector(1536),
+            embedding halfvec(1536),
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
             updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
@@ -46,7 +46,7 @@ def setup_database():
         # Create vector similarity search function
         """
         CREATE OR REPLACE FUNCTION search_documents(
-            query_embedding vector(1536),
+            query_embedding halfvec(1536),
             similarity_threshold float DEFAULT 0.7,
             match_count int DEFAULT 5
         )
@@ -56,27 +56,33 @@ def setup_database():
             content TEXT,
             similarity float
         )
-        LANGUAGE plpgsql
+        LANGUAGE sql
+        STABLE PARALLEL SAFE
+        -- Recall knob for the HNSW scan; keep it >= match_count
+        SET hnsw.ef_search = 40
         AS $$
-        BEGIN
-            RETURN query
-            SELECT 
+        -- Order by raw distance so the HNSW index serves the scan, then
+        -- apply the threshold to the top matches only
+        SELECT *
+        FROM (
+            SELECT
                 documents.id,
                 documents.title,
                 documents.content,
                 1 - (documents.embedding <=> query_embedding) AS similarity
             FROM documents
-            WHERE 1 - (documents.embedding <=> query_embedding) > similarity_threshold
-            ORDER BY similarity DESC
-            LIMIT match_count;
-        END;
+            ORDER BY documents.embedding <=> query_embedding
+            LIMIT match_count
+        ) nearest
+        WHERE nearest.similarity > similarity_threshold
+        ORDER BY nearest.similarity DESC;
         $$;
         """,
 
         # Create index for better performance
         """
         CREATE INDEX IF NOT EXISTS documents_embedding_idx ON documents 
-        USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+        USING hnsw (embedding halfvec_cosine_ops) WITH (m = 24, ef_construction = 128);
         """,
 
         # Create trigger for updated_at
@@ -146,8 +152,10 @@ async def create_sample_documents():
     try:
         kb = KnowledgeBase()
 
-        for doc in sample_docs:
-            doc_id = await kb.add_document(doc["title"], doc["content"])
+        doc_ids = await kb.add_documents(
+            [(doc["title"], doc["content"]) for doc in sample_docs])
+
+        for doc, doc_id in zip(sample_docs, doc_ids):
             if doc_id:
                 print(f"✓ Created document: {doc['title']}")
             else:
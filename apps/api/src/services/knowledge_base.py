@@ -1,51 +1,155 @@
-import os
 import asyncio
-from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+import hashlib
+import logging
+import os
+from typing import List, Dict, Any, Optional, Set, Tuple
 from ..models.llm import get_llm_provider
+from .cache import TTLCache
+from .database import (get_async_supabase, get_pg_dsn, get_supabase_credentials,
+                       match_documents, to_vector_literal)
+
+logger = logging.getLogger(__name__)
+
+# Concurrent searches arriving within this window share one embeddings request
+KB_BATCH_WINDOW_MS = float(os.getenv("KB_BATCH_WINDOW_MS", "5"))
+
+# A batch is sent as soon as it holds this many queries
+KB_BATCH_SIZE = int(os.getenv("KB_BATCH_SIZE", "16"))
+
+# How long the full document listing is served from memory
+KB_DOCUMENTS_CACHE_TTL_SECONDS = float(os.getenv("KB_DOCUMENTS_CACHE_TTL_SECONDS", "60"))
+
+# Documents per embeddings request and insert when adding in bulk
+KB_ADD_BATCH_SIZE = 100
+
+# Serve canned documents instead of talking to Supabase
+KB_DEMO_MODE = os.getenv("KB_DEMO_MODE", "false").lower() == "true"
+
+# Rows per request when listing documents; PostgREST caps responses at 1000 rows
+KB_DOCUMENTS_PAGE_SIZE = 500
+
+DEMO_DOCUMENTS: Tuple[Dict[str, str], ...] = (
+    {
+        "id": "demo-1",
+        "title": "Password Reset Guide",
+        "content": "To reset your password, click the 'Forgot Password' link on the login page. Enter your email address and check your inbox for a reset link. The link expires after 24 hours. If you don't receive the email, check your spam folder or contact support."
+    },
+    {
+        "id": "demo-2",
+        "title": "Billing and Subscription",
+        "content": "Our subscription plans are billed monthly or annually. You can change your plan at any time from your account settings. Refunds are available within 30 days of purchase for monthly plans and 14 days for annual plans. Contact billing@support.com for refund requests."
+    },
+)
 
 
 class KnowledgeBase:
     """Service for interacting with the Supabase knowledge base."""
 
     def __init__(self):
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
         self.llm = get_llm_provider()
 
-        # Initialize Supabase client
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError(
-                "Supabase credentials (SUPABASE_URL, SUPABASE_SERVICE_KEY) must be configured")
+        self.demo_mode = KB_DEMO_MODE
+
+        # Fail fast on missing credentials; the async client is created on first use
+        if not self.demo_mode:
+            get_supabase_credentials()
+
+        # Search over a direct Postgres connection when one is configured
+        self.use_direct_db = get_pg_dsn() is not None
 
+        # Queries waiting for the next embeddings batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        # Document listing, cleared whenever documents are added through this instance
+        self._documents_cache = TTLCache(maxsize=1, ttl=KB_DOCUMENTS_CACHE_TTL_SECONDS)
+
+    async def _embed_query(self, query: str) -> List[float]:
+        """Embed a query, coalescing concurrent calls into one embeddings request."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+
+        if len(self._pending) >= KB_BATCH_SIZE:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                KB_BATCH_WINDOW_MS / 1000, self._flush_pending)
+
+        return await future
+
+    def _flush_pending(self) -> None:
+        """Send the pending queries as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task is not garbage collected mid-flight
+            task = asyncio.ensure_future(self._embed_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch of queries and resolve each caller's future."""
+        # Identical concurrent questions are embedded once
+        texts = list(dict.fromkeys(query for query, _ in batch))
         try:
-            self.client: Client = create_client(
-                self.supabase_url, self.supabase_key)
+            embeddings = dict(zip(texts, await self.llm.embed(texts)))
         except Exception as e:
-            raise ValueError(f"Failed to initialize Supabase client: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for query, future in batch:
+            if not future.done():
+                future.set_result(embeddings[query])
 
     async def search_similar(self, query: str, limit: int = 5, threshold: float = 0.7) -> List[Dict[str, Any]]:
         """Search for similar documents using vector similarity."""
-        print("📚 KB: search_similar() called...")
+        try:
+            # Generate embedding for query, batched with concurrent searches
+            query_embedding = await self._embed_query(query)
+        except Exception as e:
+            logger.error("Knowledge base search failed: %s", e)
+            return []
+
+        return await self._search_by_embedding(query_embedding, limit, threshold)
 
+    async def search_similar_batch(self, queries: List[str], limit: int = 5,
+                                   threshold: float = 0.7) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one embeddings request.
+
+        Results are returned in query order; a failed search yields an empty list.
+        """
+        try:
+            embeddings = await self.llm.embed(queries)
+        except Exception as e:
+            logger.error("Knowledge base search failed: %s", e)
+            return [[] for _ in queries]
+
+        return list(await asyncio.gather(
+            *(self._search_by_embedding(embedding, limit, threshold) for embedding in embeddings)))
+
+    async def _search_by_embedding(self, query_embedding: List[float], limit: int,
+                                   threshold: float) -> List[Dict[str, Any]]:
+        """Run the similarity search for an already computed query embedding."""
         try:
-            print("📚 KB: Generating embedding...")
-            # Generate embedding for query
-            embeddings = await self.llm.embed([query])
-            query_embedding = embeddings[0]
-            print("📚 KB: Embedding generated successfully!")
-
-            # Run synchronous Supabase call in thread pool to avoid blocking
-            def _search():
-                return self.client.rpc(
-                    'match_documents',
-                    {
-                        'query_embedding': query_embedding,
-                        'match_threshold': threshold
-                    }
-                ).execute()
-
-            response = await asyncio.to_thread(_search)
+            if self.use_direct_db:
+                return await match_documents(query_embedding, threshold, limit)
+
+            client = await get_async_supabase()
+            response = await client.rpc(
+                'match_documents',
+                {
+                    'query_embedding': to_vector_literal(query_embedding),
+                    'match_threshold': threshold,
+                    'match_count': limit
+                }
+            ).execute()
 
             if response.data:
                 return response.data
@@ -53,58 +157,110 @@ class KnowledgeBase:
                 return []
 
         except Exception as e:
-            print(f"Knowledge base search failed: {str(e)}")
+            logger.error("Knowledge base search failed: %s", e)
             return []
 
     async def add_document(self, title: str, content: str) -> Optional[str]:
         """Add a new document to the knowledge base."""
         if self.demo_mode:
-            print(f"Demo mode: Would add document '{title}' to knowledge base")
-            return f"demo-{hash(title) % 10000}"
+            logger.info("Demo mode: Would add document '%s' to knowledge base", title)
+            # Stable across processes, unlike the salted builtin hash()
+            return f"demo-{hashlib.blake2b(title.encode(), digest_size=8).hexdigest()}"
+
+        return (await self.add_documents([(title, content)]))[0]
+
+    async def add_documents(self, documents: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Add (title, content) documents in batches of one embeddings request and one insert.
+
+        The next batch is embedded while the current one is inserted. Returns the
+        new ids in input order, or None for each document of a failed batch.
+        """
+        batches = [documents[start:start + KB_ADD_BATCH_SIZE]
+                   for start in range(0, len(documents), KB_ADD_BATCH_SIZE)]
+        ids: List[Optional[str]] = []
+        pending: Optional[asyncio.Future] = None
 
         try:
-            # Generate embedding for content
-            embeddings = await self.llm.embed([content])
-            content_embedding = embeddings[0]
+            for index, batch in enumerate(batches):
+                embedding = pending or asyncio.ensure_future(self._embed_documents(batch))
+                pending = None
+                try:
+                    embeddings = await embedding
+                except Exception as e:
+                    logger.error("Failed to add documents: %s", e)
+                    embeddings = None
+
+                if index + 1 < len(batches):
+                    pending = asyncio.ensure_future(self._embed_documents(batches[index + 1]))
 
-            # Run synchronous Supabase call in thread pool to avoid blocking
-            def _insert():
-                return self.client.table('documents').insert({
+                if embeddings is None:
+                    ids.extend([None] * len(batch))
+                else:
+                    ids.extend(await self._insert_documents(batch, embeddings))
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        return ids
+
+    async def _embed_documents(self, documents: List[Tuple[str, str]]) -> List[List[float]]:
+        """Embed the content of a batch of documents."""
+        return await self.llm.embed([content for _, content in documents])
+
+    async def _insert_documents(self, documents: List[Tuple[str, str]],
+                                embeddings: List[List[float]]) -> List[Optional[str]]:
+        """Insert a batch of embedded documents in one request."""
+        try:
+            client = await get_async_supabase()
+            response = await client.table('documents').insert([
+                {
                     'title': title,
                     'content': content,
-                    'embedding': content_embedding
-                }).execute()
-
-            response = await asyncio.to_thread(_insert)
+                    'embedding': to_vector_literal(embedding)
+                }
+                for (title, content), embedding in zip(documents, embeddings)
+            ]).execute()
+            self._documents_cache.clear()
 
             if response.data:
-                return response.data[0]['id']
+                return [row['id'] for row in response.data]
             else:
-                return None
+                return [None] * len(documents)
 
         except Exception as e:
-            print(f"Failed to add document: {str(e)}")
-            return None
+            logger.error("Failed to add documents: %s", e)
+            return [None] * len(documents)
 
-    def get_all_documents(self) -> List[Dict[str, Any]]:
-        """Get all documents from the knowledge base."""
+    async def get_all_documents(self, page_size: int = KB_DOCUMENTS_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Get all documents from the knowledge base, without their embeddings."""
         if self.demo_mode:
-            return [
-                {
-                    "id": "demo-1",
-                    "title": "Password Reset Guide",
-                    "content": "To reset your password, click the 'Forgot Password' link on the login page. Enter your email address and check your inbox for a reset link. The link expires after 24 hours. If you don't receive the email, check your spam folder or contact support."
-                },
-                {
-                    "id": "demo-2",
-                    "title": "Billing and Subscription",
-                    "content": "Our subscription plans are billed monthly or annually. You can change your plan at any time from your account settings. Refunds are available within 30 days of purchase for monthly plans and 14 days for annual plans. Contact billing@support.com for refund requests."
-                }
-            ]
+            # Copies, so callers cannot mutate the shared demo rows
+            return [dict(document) for document in DEMO_DOCUMENTS]
+
+        cached = self._documents_cache.get("all")
+        if cached is not None:
+            # Copies, so callers cannot corrupt the cache for later calls
+            return [dict(document) for document in cached]
 
         try:
-            response = self.client.table('documents').select('*').execute()
-            return response.data if response.data else []
+            client = await get_async_supabase()
+            documents: List[Dict[str, Any]] = []
+            while True:
+                # Embeddings dominate row size and callers never need them
+                response = await (
+                    client.table('documents')
+                    .select('id,title,content')
+                    .order('id')
+                    .range(len(documents), len(documents) + page_size - 1)
+                    .execute()
+                )
+                page = response.data or []
+                documents.extend(page)
+                if len(page) < page_size:
+                    break
+
+            self._documents_cache.set("all", documents)
+            return [dict(document) for document in documents]
         except Exception as e:
-            print(f"Failed to get documents: {str(e)}")
+            logger.error("Failed to get documents: %s", e)
             return []
@@ -0,0 +1,135 @@
+"""
+Shared fixtures for the integration tests.
+
+Providers, the knowledge base and the workflow are created once per session.
+They can be shared because all async tests run on the session event loop
+(asyncio_default_test_loop_scope in pyproject.toml), and the shared HTTP
+clients are bound to the loop they first ran on.
+
+Set INTEGRATION_RESPONSE_CACHE=true to replay workflow responses recorded by
+an earlier run from the pytest cache instead of calling the LLM again.
+
+HTTP traffic of tests marked with vcr is recorded to cassettes under
+cassettes/ and replayed on later runs (pytest-recording). Set
+VCR_RECORD_MODE=none in CI to fail on any request missing from a cassette.
+Query embeddings are not batched during integration tests, so every
+embeddings request body is the same from run to run.
+"""
+
+import os
+
+import orjson
+import pytest
+
+from src.services import knowledge_base as knowledge_base_module
+from src.services.knowledge_base import KnowledgeBase
+from src.agents.workflow import AgentWorkflow
+from src.models.llm import get_llm_provider
+from src.services.cache import request_cache_key
+
+# Replay recorded workflow responses across runs
+RESPONSE_CACHE_ENABLED = os.getenv(
+    "INTEGRATION_RESPONSE_CACHE", "false").lower() == "true"
+
+# pytest cache entry holding the recorded responses
+RESPONSE_CACHE_KEY = "integration/workflow_responses"
+
+# Record requests missing from a cassette by default; "none" replays only
+VCR_RECORD_MODE = os.getenv("VCR_RECORD_MODE", "new_episodes")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def unbatched_query_embeddings():
+    """Embed each query in its own request, so cassettes can match requests by body.
+
+    Batches depend on which searches happen to overlap, which differs between
+    the recording run and a replay.
+    """
+    with pytest.MonkeyPatch.context() as patcher:
+        patcher.setattr(knowledge_base_module, "KB_BATCH_SIZE", 1)
+        yield
+
+
+@pytest.fixture(scope="session")
+def llm_provider():
+    """Create LLM provider fixture."""
+    return get_llm_provider()
+
+
+@pytest.fixture(scope="session")
+def knowledge_base():
+    """Create knowledge base fixture."""
+    return KnowledgeBase()
+
+
+@pytest.fixture(scope="session")
+def workflow():
+    """Create workflow fixture."""
+    return AgentWorkflow()
+
+
+@pytest.fixture(scope="module")
+def vcr_config():
+    """Cassette settings for pytest-recording."""
+    return {
+        "record_mode": VCR_RECORD_MODE,
+        # Credentials must never end up in a cassette
+        "filter_headers": ["authorization", "api-key", "apikey"],
+        # Prompts share one endpoint, so requests are told apart by their body
+        "match_on": ["method", "scheme", "host", "path", "query", "body"],
+    }
+
+
+@pytest.fixture(scope="session", autouse=True)
+def recorded_responses(request):
+    """Serve process_request from responses recorded by earlier runs, when enabled."""
+    if not RESPONSE_CACHE_ENABLED:
+        yield
+        return
+
+    cache = request.config.cache
+    recorded = cache.get(RESPONSE_CACHE_KEY, {})
+    process_request = AgentWorkflow.process_request
+
+    async def replay_or_record(self, request_text):
+        key = request_cache_key(request_text)
+        if key not in recorded:
+            response = await process_request(self, request_text)
+            # Responses degraded by an agent failure are not worth replaying
+            if any(isinstance(step["output"], dict) and "error" in step["output"]
+                   for step in response["trace"]):
+                return response
+            recorded[key] = orjson.loads(orjson.dumps(response, default=str))
+        # Hand out copies, so a test mutating its result cannot affect later ones
+        return orjson.loads(orjson.dumps(recorded[key]))
+
+    with pytest.MonkeyPatch.context() as patcher:
+        patcher.setattr(AgentWorkflow, "process_request", replay_or_record)
+        yield
+
+    # Parallel workers share the cache file; merge rather than overwrite their entries
+    cache.set(RESPONSE_CACHE_KEY, {**cache.get(RESPONSE_CACHE_KEY, {}), **recorded})
+
+
+@pytest.fixture
+def responses_replayed(request):
+    """Return a check for whether the test was served recorded rather than live responses."""
+    cassette = (request.getfixturevalue("vcr")
+                if request.config.pluginmanager.hasplugin("recording") else None)
+    return lambda: RESPONSE_CACHE_ENABLED or bool(cassette and cassette.play_count)
+
+
+@pytest.fixture(autouse=True)
+def reset_workflow_caches(request):
+    """Clear cached agent results so each test exercises the full pipeline."""
+    yield
+    if "workflow" in request.fixturenames:
+        shared = request.getfixturevalue("workflow")
+        shared.classifier._cache.clear()
+        shared.retriever._cache.clear()
+
+
+@pytest.fixture
+def isolated_workflow():
+    """Create a fresh workflow for tests that modify workflow state."""
+    return AgentWorkflow()
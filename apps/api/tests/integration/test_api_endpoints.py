@@ -6,10 +6,12 @@ Tests the FastAPI endpoints directly for proper validation and error handling.
 
 import asyncio
 import json
+import statistics
 import time
 from typing import Dict, Any, List
 import sys
 import os
+import httpx
 import requests
 from concurrent.futures import ThreadPoolExecutor
 
@@ -139,8 +141,8 @@ class APIEndpointTester:
                 timeout=10
             )
 
-            # Should return 400 for empty request
-            success = response.status_code == 400
+            # Should return 422, rejected by request validation
+            success = response.status_code == 422
             data = response.json() if response.headers.get(
                 'content-type', '').startswith('application/json') else {}
 
@@ -149,7 +151,7 @@ class APIEndpointTester:
                 'success': success,
                 'status_code': response.status_code,
                 'response_time_ms': response.elapsed.total_seconds() * 1000,
-                'returns_400': response.status_code == 400,
+                'returns_422': response.status_code == 422,
                 'has_error_detail': 'detail' in data,
                 'error_message': data.get('detail', '') if success else ''
             }
@@ -283,39 +285,43 @@ class APIEndpointTester:
             {"request_text": "Enable two-factor authentication"}
         ]
 
-        def make_request(request_data):
+        async def make_request(client: httpx.AsyncClient, request_data):
+            loop = asyncio.get_running_loop()
+            started = loop.time()
             try:
-                response = self.session.post(
-                    f"{self.base_url}/process",
-                    json=request_data,
-                    timeout=30
-                )
+                response = await client.post("/process", json=request_data)
                 return {
                     'success': response.status_code == 200,
                     'status_code': response.status_code,
-                    'response_time_ms': response.elapsed.total_seconds() * 1000
+                    # Wall clock as seen by the caller, including any queueing
+                    'response_time_ms': (loop.time() - started) * 1000
                 }
             except Exception as e:
                 return {
                     'success': False,
                     'error': str(e),
-                    'response_time_ms': 30000  # Timeout
+                    'response_time_ms': (loop.time() - started) * 1000
                 }
 
-        start_time = time.time()
+        async def send_all():
+            # One event loop and one connection pool instead of a thread per request
+            async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
+                return await asyncio.gather(
+                    *(make_request(client, req) for req in requests_data))
+
+        start_time = time.perf_counter()
 
         try:
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                futures = [executor.submit(make_request, req)
-                           for req in requests_data]
-                results = [future.result() for future in futures]
+            results = asyncio.run(send_all())
 
-            end_time = time.time()
-            total_time = (end_time - start_time) * 1000
+            total_time = (time.perf_counter() - start_time) * 1000
 
             successful_requests = sum(1 for r in results if r['success'])
-            average_response_time = sum(r['response_time_ms']
-                                        for r in results) / len(results)
+            response_times = [r['response_time_ms'] for r in results]
+            average_response_time = sum(response_times) / len(response_times)
+            # Tail latency is what degrades under load; the mean hides it
+            percentiles = statistics.quantiles(
+                response_times, n=100, method='inclusive')
 
             return {
                 'test_name': 'Concurrent API Requests',
@@ -324,6 +330,9 @@ class APIEndpointTester:
                 'successful_requests': successful_requests,
                 'total_time_ms': total_time,
                 'average_response_time_ms': average_response_time,
+                'p50_response_time_ms': percentiles[49],
+                'p95_response_time_ms': percentiles[94],
+                'p99_response_time_ms': percentiles[98],
                 'results': results
             }
         except Exception as e:
@@ -333,6 +342,17 @@ class APIEndpointTester:
                 'error': str(e)
             }
 
+    def _run_test(self, test_func) -> Dict[str, Any]:
+        """Run one test, turning unexpected exceptions into a failed result."""
+        try:
+            return test_func()
+        except Exception as e:
+            return {
+                'test_name': test_func.__name__,
+                'success': False,
+                'error': f"Test framework error: {str(e)}"
+            }
+
     def run_all_api_tests(self) -> Dict[str, Any]:
         """Run all API endpoint tests."""
         print("🚀 Starting API Endpoint Tests")
@@ -353,32 +373,26 @@ class APIEndpointTester:
 
         print("✅ Server is running, starting tests...")
 
-        test_functions = [
+        # Quick checks that share no state run in parallel
+        independent_tests = [
             self.test_health_endpoint,
             self.test_root_endpoint,
-            self.test_process_endpoint_valid,
             self.test_process_endpoint_empty,
             self.test_process_endpoint_missing_field,
-            self.test_process_endpoint_large_payload,
             self.test_cors_headers,
+        ]
+        # Checks that exercise the agent pipeline run one at a time, so their timings stay comparable
+        serial_tests = [
+            self.test_process_endpoint_valid,
+            self.test_process_endpoint_large_payload,
             self.test_concurrent_requests,
         ]
 
-        results = []
-        successful_tests = 0
+        with ThreadPoolExecutor(max_workers=len(independent_tests)) as executor:
+            results = list(executor.map(self._run_test, independent_tests))
+        results.extend(self._run_test(test_func) for test_func in serial_tests)
 
-        for test_func in test_functions:
-            try:
-                result = test_func()
-                results.append(result)
-                if result['success']:
-                    successful_tests += 1
-            except Exception as e:
-                results.append({
-                    'test_name': test_func.__name__,
-                    'success': False,
-                    'error': f"Test framework error: {str(e)}"
-                })
+        successful_tests = sum(1 for result in results if result['success'])
 
         # Calculate summary
         success_rate = (successful_tests / len(results)) * 100
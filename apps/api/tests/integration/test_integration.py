@@ -8,67 +8,58 @@ import asyncio
 import time
 from typing import Dict, Any
 
-from src.services.knowledge_base import KnowledgeBase
-from src.agents.workflow import AgentWorkflow
-from src.models.llm import AzureOpenAIProvider
+# Agents every complete trace must contain
+EXPECTED_AGENTS = frozenset({'ClassifierAgent', 'RetrieverAgent',
+                             'WriterAgent', 'GuardAgent', 'LoggerAgent'})
 
+# Scheduling slack on top of the slowest request when requests run concurrently
+CONCURRENCY_BUFFER_MS = 1000
 
+
+@pytest.mark.vcr
 class TestIntegration:
     """Integration test class for the Agentic Support Copilot."""
 
-    @pytest.fixture
-    def llm_provider(self):
-        """Create LLM provider fixture."""
-        return AzureOpenAIProvider()
-
-    @pytest.fixture
-    def knowledge_base(self):
-        """Create knowledge base fixture."""
-        return KnowledgeBase()
-
-    @pytest.fixture
-    def workflow(self):
-        """Create workflow fixture."""
-        return AgentWorkflow()
+    def validate_response_structure(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate the structure of a response.
 
-    def validate_response_structure(self, response: Dict[str, Any]) -> Dict[str, bool]:
-        """Validate the structure of a response."""
+        Besides the boolean checks, returns the set of agents in the trace and the
+        classifier's output, both collected in one pass over the trace.
+        """
         validation = {
             'has_answer': bool(response.get('answer')),
             'has_sources': 'sources' in response,
             'has_trace': 'trace' in response,
             'has_metrics': 'metrics' in response,
             'trace_complete': False,
-            'metrics_accurate': False
+            'metrics_accurate': False,
+            'agents': set(),
+            'classification': {}
         }
 
         # Validate trace completeness
-        trace = response.get('trace', [])
-        expected_agents = ['ClassifierAgent', 'RetrieverAgent',
-                           'WriterAgent', 'GuardAgent', 'LoggerAgent']
-        actual_agents = [step.get('agent_name') for step in trace]
-        validation['trace_complete'] = all(
-            agent in actual_agents for agent in expected_agents)
+        for step in response.get('trace', []):
+            validation['agents'].add(step.get('agent_name'))
+            if step.get('agent_name') == 'ClassifierAgent':
+                validation['classification'] = step.get('output') or {}
+        validation['trace_complete'] = EXPECTED_AGENTS <= validation['agents']
 
         # Validate metrics
-        metrics = response.get('metrics', {})
+        metrics = response.get('metrics') or {}
         validation['metrics_accurate'] = (
-            'latency_ms' in metrics and
-            'token_usage' in metrics and
-            metrics['latency_ms'] > 0 and
-            metrics['token_usage'] > 0
+            metrics.get('latency_ms', 0) > 0 and
+            metrics.get('token_usage', 0) > 0
         )
 
         return validation
 
-    @pytest.mark.asyncio
     async def test_password_reset_request(self, workflow):
         """Test password reset request processing."""
         request_text = "I need to reset my password, I forgot it"
 
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = await workflow.process_request(request_text)
-        end_time = time.time()
+        end_time = time.perf_counter()
 
         # Basic assertions
         assert result is not None
@@ -92,7 +83,6 @@ class TestIntegration:
         assert result['metrics']['latency_ms'] > 0
         assert result['metrics']['token_usage'] > 0
 
-    @pytest.mark.asyncio
     async def test_login_issue_request(self, workflow):
         """Test login issue request processing."""
         request_text = "I can't log into my account, it says invalid credentials"
@@ -106,13 +96,9 @@ class TestIntegration:
         assert len(result['trace']) > 0
 
         # Check trace contains all expected agents
-        agent_names = [step['agent_name'] for step in result['trace']]
-        expected_agents = ['ClassifierAgent', 'RetrieverAgent',
-                           'WriterAgent', 'GuardAgent', 'LoggerAgent']
-        for agent in expected_agents:
-            assert agent in agent_names
+        agents = self.validate_response_structure(result)['agents']
+        assert EXPECTED_AGENTS <= agents, EXPECTED_AGENTS - agents
 
-    @pytest.mark.asyncio
     async def test_billing_inquiry_request(self, workflow):
         """Test billing inquiry request processing."""
         request_text = "I was charged twice this month, can you help?"
@@ -125,13 +111,11 @@ class TestIntegration:
         assert validation['has_metrics']
 
         # Check classification in trace
-        classification = result['trace'][0]['output'] if result['trace'] else {
-        }
+        classification = validation['classification']
         assert 'intent' in classification
         assert 'sentiment' in classification
         assert 'urgency' in classification
 
-    @pytest.mark.asyncio
     async def test_urgent_outage_request(self, workflow):
         """Test urgent outage request processing."""
         request_text = "The system is down and I can't access my data"
@@ -139,14 +123,12 @@ class TestIntegration:
         result = await workflow.process_request(request_text)
 
         # Should be classified as urgent
-        classification = result['trace'][0]['output'] if result['trace'] else {
-        }
+        classification = self.validate_response_structure(result)['classification']
         assert classification.get('urgency') == 'high'
 
         # Should have safety validation
         assert result.get('is_safe') is not None
 
-    @pytest.mark.asyncio
     async def test_feature_request(self, workflow):
         """Test feature request processing."""
         request_text = "How do I enable two-factor authentication?"
@@ -158,8 +140,8 @@ class TestIntegration:
         assert len(result['answer']) > 10  # Should have meaningful content
         assert result['metrics']['latency_ms'] > 0
 
-    @pytest.mark.asyncio
-    async def test_concurrent_requests(self, workflow):
+    @pytest.mark.xdist_group("serial")
+    async def test_concurrent_requests(self, workflow, responses_replayed):
         """Test handling of multiple concurrent requests."""
         requests = [
             "I need to reset my password",
@@ -168,8 +150,10 @@ class TestIntegration:
         ]
 
         # Run requests concurrently
+        start_time = time.perf_counter()
         tasks = [workflow.process_request(req) for req in requests]
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
 
         # All should succeed
         assert len(results) == len(requests)
@@ -178,7 +162,13 @@ class TestIntegration:
             assert result is not None
             assert 'answer' in result
 
-    @pytest.mark.asyncio
+        # Overlapping requests finish shortly after the slowest one; run one after
+        # another, the wall clock would approach the sum of their latencies.
+        # Replayed responses carry the recording run's latencies, so skip it then.
+        if not responses_replayed():
+            slowest_ms = max(result['metrics']['latency_ms'] for result in results)
+            assert elapsed_ms < slowest_ms + CONCURRENCY_BUFFER_MS
+
     async def test_empty_request_handling(self, workflow):
         """Test handling of empty request."""
         result = await workflow.process_request("")
@@ -190,7 +180,6 @@ class TestIntegration:
         # Should contain some response even for empty input
         assert len(result['answer']) > 0
 
-    @pytest.mark.asyncio
     async def test_special_characters(self, workflow):
         """Test handling of special characters and unicode."""
         request_text = "Help! My password ñoño 🚀 contains émojis and ñ characters."
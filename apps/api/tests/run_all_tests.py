@@ -4,90 +4,110 @@ Comprehensive test runner for the Agentic Support Copilot.
 Orchestrates all test suites and provides a complete validation report.
 """
 
+import argparse
 import asyncio
-import subprocess
-import sys
+import importlib.util
 import os
+import sys
 import time
-from typing import Dict, Any, List
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
 
+import orjson
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Reports go to the repository root
+REPORTS_DIR = SCRIPT_DIR.parents[2] / 'reports'
+
+# Wall-clock limit for the whole run; the suites run side by side
+SUITE_TIMEOUT_SECONDS = 300
+
+# Per-test limit applied by pytest-timeout, so one hung call fails a single test
+TEST_TIMEOUT_SECONDS = 120
+
+# Make the app and the integration helpers importable when run as a script
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from tests.integration.test_api_endpoints import APIEndpointTester
+
+
+class ResultCollector:
+    """pytest plugin that records the outcome and duration of each test."""
 
-class ComprehensiveTestRunner:
     def __init__(self):
-        self.start_time = time.time()
+        self.reports = []
+
+    def pytest_runtest_logreport(self, report):
+        # A test's outcome is its call phase, unless setup already failed or skipped it
+        if report.when == "call" or (report.when == "setup" and not report.passed):
+            self.reports.append(report)
+
+
+class ComprehensiveTestRunner:
+    def __init__(self, fail_fast: bool = True):
+        self.start_time = time.perf_counter()
         self.test_results = {}
+        # Stop the pytest session at the first failing test
+        self.fail_fast = fail_fast
 
-    async def run_test_script(self, script_name: str, script_path: str) -> Dict[str, Any]:
-        """Run a test script and capture its output."""
+    def run_api_endpoint_tests(self) -> Dict[str, Any]:
+        """Run the API endpoint checks against the running server."""
         print(f"\n{'='*60}")
-        print(f"🚀 Running {script_name}")
+        print("🚀 Running API Endpoint Tests")
         print(f"{'='*60}")
 
-        try:
-            # Run the test script
-            result = subprocess.run(
-                [sys.executable, script_path],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-
-            return {
-                'script_name': script_name,
-                'success': result.returncode == 0,
-                'return_code': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'execution_time': time.time() - self.start_time
-            }
-        except subprocess.TimeoutExpired:
-            return {
-                'script_name': script_name,
-                'success': False,
-                'error': 'Test script timed out after 5 minutes',
-                'execution_time': time.time() - self.start_time
-            }
-        except Exception as e:
-            return {
-                'script_name': script_name,
-                'success': False,
-                'error': str(e),
-                'execution_time': time.time() - self.start_time
-            }
+        summary = APIEndpointTester().run_all_api_tests()
+        success_rate = summary.get('success_rate', 0)
+        return {
+            'script_name': 'API Endpoint Tests',
+            'success': success_rate > 90,
+            'error': summary.get('error'),
+            'details': {'success_rate': success_rate},
+            'execution_time': time.perf_counter() - self.start_time
+        }
 
-    def parse_test_results(self, script_output: str) -> Dict[str, Any]:
-        """Parse test results from script output."""
-        try:
-            # Look for JSON-like patterns in the output
-            lines = script_output.split('\n')
-            results = {}
-
-            for line in lines:
-                if 'Success Rate:' in line:
-                    # Extract success rate percentage
-                    import re
-                    match = re.search(r'Success Rate: (\d+\.?\d*)%', line)
-                    if match:
-                        results['success_rate'] = float(match.group(1))
-
-                if 'Average Latency:' in line:
-                    # Extract average latency
-                    import re
-                    match = re.search(r'Average Latency: (\d+\.?\d*)ms', line)
-                    if match:
-                        results['average_latency_ms'] = float(match.group(1))
-
-                if 'Average Tokens:' in line:
-                    # Extract average tokens
-                    import re
-                    match = re.search(r'Average Tokens: (\d+\.?\d*)', line)
-                    if match:
-                        results['average_tokens'] = float(match.group(1))
-
-            return results
-        except Exception:
-            return {}
+    def run_pytest_suites(self, suites: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Run pytest suites in one in-process session and summarize each suite.
+
+        A single session lets the suites share session-scoped fixtures.
+        """
+        print(f"\n{'='*60}")
+        print(f"🚀 Running {', '.join(name for name, _ in suites)}")
+        print(f"{'='*60}")
+
+        collector = ResultCollector()
+        args = [str(SCRIPT_DIR / path) for _, path in suites] + ["-q", "--tb=short"]
+        # Spread tests over one worker per core when pytest-xdist is installed
+        if importlib.util.find_spec("xdist") is not None:
+            args += ["-n", "auto", "--dist", "loadgroup"]
+        if importlib.util.find_spec("pytest_timeout") is not None:
+            # pytest.main runs in a worker thread, where SIGALRM can't be installed
+            args += [f"--timeout={TEST_TIMEOUT_SECONDS}", "--timeout-method=thread"]
+        if self.fail_fast:
+            args.append("--exitfirst")
+        pytest.main(args, plugins=[collector])
+
+        results = {}
+        for suite_name, path in suites:
+            reports = [r for r in collector.reports
+                       if r.nodeid.split("::")[0].endswith(path)]
+            passed = sum(1 for r in reports if r.passed)
+            durations_ms = [r.duration * 1000 for r in reports if r.when == "call"]
+            results[suite_name] = {
+                'script_name': suite_name,
+                'success': bool(reports) and passed == len(reports),
+                'error': None if reports else 'No tests collected',
+                'details': {
+                    'success_rate': (passed / len(reports)) * 100 if reports else 0,
+                    'average_latency_ms': sum(durations_ms) / len(durations_ms) if durations_ms else 0,
+                },
+                'failed_tests': [r.nodeid for r in reports if r.failed],
+                'execution_time': time.perf_counter() - self.start_time
+            }
+        return results
 
     async def run_all_test_suites(self) -> Dict[str, Any]:
         """Run all test suites."""
@@ -95,37 +115,23 @@ class ComprehensiveTestRunner:
         print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 80)
 
-        # Define test scripts to run
-        test_scripts = [
-            ("API Endpoint Tests", "integration/test_api_endpoints.py"),
+        # pytest suites, run in this process rather than one interpreter each
+        pytest_suites = [
             ("Integration Tests", "integration/test_integration.py"),
             ("Error Scenario Tests", "integration/test_error_scenarios.py"),
         ]
 
-        script_dir = os.path.dirname(__file__)
-        overall_success = True
-
-        for script_name, script_file in test_scripts:
-            script_path = os.path.join(script_dir, script_file)
-
-            if not os.path.exists(script_path):
-                print(f"❌ Test script not found: {script_path}")
-                self.test_results[script_name] = {
-                    'success': False,
-                    'error': 'Script not found'
-                }
-                overall_success = False
-                continue
-
-            # Run the test script
-            result = await self.run_test_script(script_name, script_path)
-            self.test_results[script_name] = result
-
-            # Print the output
-            print(result['stdout'])
-            if result['stderr']:
-                print(f"STDERR: {result['stderr']}")
+        # The suites are independent and mostly wait on the network, so run them
+        # side by side; both start their own event loops, so keep them off this one
+        api_result, pytest_results = await asyncio.gather(
+            asyncio.to_thread(self.run_api_endpoint_tests),
+            asyncio.to_thread(self.run_pytest_suites, pytest_suites),
+        )
+        self.test_results["API Endpoint Tests"] = api_result
+        self.test_results.update(pytest_results)
 
+        overall_success = True
+        for script_name, result in self.test_results.items():
             if not result['success']:
                 overall_success = False
                 print(f"❌ {script_name} failed")
@@ -133,7 +139,7 @@ class ComprehensiveTestRunner:
                 print(f"✅ {script_name} completed successfully")
 
         # Generate comprehensive report
-        end_time = time.time()
+        end_time = time.perf_counter()
         total_execution_time = end_time - self.start_time
 
         report = self.generate_comprehensive_report(
@@ -156,11 +162,11 @@ class ComprehensiveTestRunner:
             successful_suites / total_suites) * 100 if total_suites > 0 else 0
 
         # Parse detailed results from each test suite
-        detailed_results = {}
-        for suite_name, result in self.test_results.items():
-            if result['success'] and result['stdout']:
-                detailed_results[suite_name] = self.parse_test_results(
-                    result['stdout'])
+        detailed_results = {
+            suite_name: result['details']
+            for suite_name, result in self.test_results.items()
+            if 'details' in result
+        }
 
         # Performance summary
         performance_summary = {}
@@ -319,17 +325,12 @@ class ComprehensiveTestRunner:
     def save_report_to_file(self, report: Dict[str, Any]):
         """Save the test report to a file."""
         try:
-            reports_dir = os.path.join(os.path.dirname(
-                __file__), '..', '..', '..', 'reports')
-            os.makedirs(reports_dir, exist_ok=True)
+            REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            report_file = os.path.join(
-                reports_dir, f"test_report_{timestamp}.json")
-
-            with open(report_file, 'w') as f:
-                import json
-                json.dump(report, f, indent=2, default=str)
+            report_file = REPORTS_DIR / f"test_report_{timestamp}.json"
+            report_file.write_bytes(
+                orjson.dumps(report, option=orjson.OPT_INDENT_2, default=str))
 
             print(f"\n📄 Detailed report saved to: {report_file}")
         except Exception as e:
@@ -338,8 +339,22 @@ class ComprehensiveTestRunner:
 
 async def main():
     """Main entry point for comprehensive testing."""
-    runner = ComprehensiveTestRunner()
-    report = await runner.run_all_test_suites()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--no-fail-fast", action="store_true",
+        help="run every test even after a failure, e.g. for nightly full reports")
+    args = parser.parse_args()
+
+    runner = ComprehensiveTestRunner(fail_fast=not args.no_fail_fast)
+    try:
+        report = await asyncio.wait_for(
+            runner.run_all_test_suites(), SUITE_TIMEOUT_SECONDS)
+    except TimeoutError:
+        print(f"\n⏱️  Test suites did not finish within {SUITE_TIMEOUT_SECONDS} seconds")
+        # The suites run in worker threads, which cannot be cancelled; exit
+        # without waiting for them
+        sys.stdout.flush()
+        os._exit(1)
 
     # Exit with appropriate code
     if report['overall_success'] and report['quality_assessment']['overall_score'] >= 80:
@@ -10,17 +10,69 @@ This test suite validates:
 5. CORS middleware configuration
 """
 
+import asyncio
+import importlib.util
+import httpx
+import orjson
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
-from src.main import app
+from src.main import app, create_app, ProcessResponse
 
+# The app without CORS middleware, for tests that don't check CORS headers
+plain_app = create_app(cors=False)
 
-@pytest.fixture
+# ~20,000 characters, serialized once at import
+LARGE_REQUEST_TEXT = "This is a very long request. " * 1000
+LARGE_REQUEST_BODY = orjson.dumps({"request_text": LARGE_REQUEST_TEXT})
+
+
+def response_json(response):
+    """Decode a response body with orjson rather than the stdlib json module."""
+    return orjson.loads(response.content)
+
+
+@pytest.fixture(scope="session")
 def client():
-    """Create a test client for the FastAPI app."""
-    return TestClient(app)
+    """Create a test client for the app without CORS, shared by all tests.
+
+    Tests patch src.main.workflow rather than the app, so one client is safe to reuse.
+    Entering it runs the lifespan once and keeps the portal open for the session.
+    """
+    with TestClient(plain_app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def cors_client():
+    """Create a test client for the full app, including the CORS middleware."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+async def async_client():
+    """Create an async client that calls the app in-process, for concurrent requests."""
+    transport = httpx.ASGITransport(app=plain_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def process_request_mock():
+    """One AsyncMock for workflow.process_request, built once and reset per test."""
+    return AsyncMock()
+
+
+@pytest.fixture
+def mock_workflow(monkeypatch, process_request_mock):
+    """Replace the app's workflow with a mock for the duration of a test."""
+    process_request_mock.reset_mock(return_value=True, side_effect=True)
+    workflow = MagicMock()
+    workflow.process_request = process_request_mock
+    monkeypatch.setattr("src.main.workflow", workflow)
+    return workflow
 
 
 @pytest.fixture
@@ -40,7 +92,7 @@ def mock_workflow_result():
             {
                 "agent_name": "ClassifierAgent",
                 "step_name": "classify_request",
-                "input": {"request_text": "I forgot my password"},
+                "input": {"request_length": 20},
                 "output": {"intent": "account_issue", "sentiment": "neutral", "urgency": "high"},
                 "duration_ms": 245,
                 "timestamp": "2023-12-01T10:30:00.000Z"
@@ -61,7 +113,7 @@ class TestHealthEndpoint:
         response = client.get("/health")
 
         assert response.status_code == 200
-        data = response.json()
+        data = response_json(response)
         assert data["status"] == "healthy"
         assert "timestamp" in data
         assert data["version"] == "0.1.0"
@@ -75,7 +127,7 @@ class TestRootEndpoint:
         response = client.get("/")
 
         assert response.status_code == 200
-        data = response.json()
+        data = response_json(response)
         assert data["message"] == "Agentic Support Copilot API"
         assert data["version"] == "0.1.0"
         assert data["docs"] == "/docs"
@@ -85,12 +137,10 @@ class TestRootEndpoint:
 class TestProcessEndpoint:
     """Test process endpoint functionality."""
 
-    @patch('src.main.workflow')
     def test_process_request_success(self, mock_workflow, client, mock_workflow_result):
         """Test successful processing of a support request."""
         # Mock the workflow to return test data
-        mock_workflow.process_request = AsyncMock(
-            return_value=mock_workflow_result)
+        mock_workflow.process_request.return_value = mock_workflow_result
 
         # Send test request
         response = client.post(
@@ -100,7 +150,7 @@ class TestProcessEndpoint:
 
         # Verify response
         assert response.status_code == 200
-        data = response.json()
+        data = response_json(response)
         assert data["answer"] == mock_workflow_result["answer"]
         assert len(data["sources"]) == 1
         assert data["sources"][0]["title"] == "Password Reset Guide"
@@ -116,30 +166,35 @@ class TestProcessEndpoint:
         """Test process endpoint rejects empty request text."""
         response = client.post("/process", json={"request_text": ""})
 
-        assert response.status_code == 400
-        data = response.json()
-        assert "Request text cannot be empty" in data["detail"]
+        assert response.status_code == 422  # Rejected while parsing the body
+        data = response_json(response)
+        assert data["detail"][0]["loc"] == ["body", "request_text"]
+        assert "request_text cannot be empty" in data["detail"][0]["msg"]
 
     def test_process_request_whitespace_only(self, client):
         """Test process endpoint rejects whitespace-only text."""
         response = client.post("/process", json={"request_text": "   \n\t   "})
 
-        assert response.status_code == 400
-        data = response.json()
-        assert "Request text cannot be empty" in data["detail"]
+        assert response.status_code == 422  # Rejected while parsing the body
+        data = response_json(response)
+        assert data["detail"][0]["loc"] == ["body", "request_text"]
+        assert "request_text cannot be empty" in data["detail"][0]["msg"]
 
-    def test_process_request_missing_field(self, client):
-        """Test process endpoint rejects missing request_text field."""
-        response = client.post("/process", json={})
+    @pytest.mark.parametrize("body", [
+        {},
+        {"request_text": 123},
+        {"request_text": None},
+    ], ids=["missing", "wrong_type", "null"])
+    def test_process_request_invalid_body(self, client, body):
+        """Test process endpoint rejects a missing or non-string request_text."""
+        response = client.post("/process", json=body)
 
         assert response.status_code == 422  # Validation error
 
-    @patch('src.main.workflow')
     def test_process_request_workflow_error(self, mock_workflow, client):
         """Test process endpoint handles workflow errors gracefully."""
         # Mock workflow to raise an exception
-        mock_workflow.process_request = AsyncMock(
-            side_effect=Exception("Test error"))
+        mock_workflow.process_request.side_effect = Exception("Test error")
 
         response = client.post(
             "/process",
@@ -147,25 +202,53 @@ class TestProcessEndpoint:
         )
 
         assert response.status_code == 500
-        data = response.json()
+        data = response_json(response)
         assert "An error occurred while processing your request" in data["detail"]
 
 
+class TestProcessStreamEndpoint:
+    """Test streaming process endpoint."""
+
+    def test_process_stream_sends_tokens_then_result(self, mock_workflow, client, mock_workflow_result):
+        """Test stream endpoint emits token events followed by the full result."""
+        async def events(request_text):
+            yield {"type": "token", "content": "Here's how "}
+            yield {"type": "token", "content": "to reset your password..."}
+            yield {"type": "result", "data": mock_workflow_result}
+
+        mock_workflow.stream_request = events
+
+        response = client.post("/process/stream", json={"request_text": "I forgot my password"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events_sent = [orjson.loads(line[len("data: "):])
+                       for line in response.text.split("\n\n") if line]
+        assert [event["type"] for event in events_sent] == ["token", "token", "result"]
+        assert events_sent[-1]["data"]["answer"] == mock_workflow_result["answer"]
+
+    def test_process_stream_rejects_empty_text(self, client):
+        """Test stream endpoint rejects empty request text."""
+        response = client.post("/process/stream", json={"request_text": "  "})
+
+        assert response.status_code == 422
+
+
 class TestCORSConfiguration:
     """Test CORS middleware configuration."""
 
-    def test_cors_headers_present(self, client):
+    def test_cors_headers_present(self, cors_client):
         """Test CORS headers are present in responses."""
-        response = client.get(
+        response = cors_client.get(
             "/health", headers={"Origin": "http://localhost:3000"})
 
         # Check for CORS headers - only origin header is added to simple requests
         assert "access-control-allow-origin" in response.headers
         assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
 
-    def test_preflight_request(self, client):
+    def test_preflight_request(self, cors_client):
         """Test CORS preflight request handling."""
-        response = client.options(
+        response = cors_client.options(
             "/process",
             headers={
                 "Origin": "http://localhost:3000",
@@ -181,78 +264,34 @@ class TestCORSConfiguration:
 class TestRequestResponseModels:
     """Test request and response model validation."""
 
-    def test_process_request_model_validation(self, client):
-        """Test ProcessRequest model validation."""
-        # Test with invalid data type
-        response = client.post("/process", json={"request_text": 123})
-
-        assert response.status_code == 422  # Validation error
-
-    def test_process_response_structure(self, client, mock_workflow_result):
+    def test_process_response_structure(self, client, mock_workflow, mock_workflow_result):
         """Test ProcessResponse model structure validation."""
-        with patch('src.main.workflow') as mock_workflow:
-            mock_workflow.process_request = AsyncMock(
-                return_value=mock_workflow_result)
+        mock_workflow.process_request.return_value = mock_workflow_result
 
-            response = client.post(
-                "/process",
-                json={"request_text": "Test request"}
-            )
+        response = client.post(
+            "/process",
+            json={"request_text": "Test request"}
+        )
 
-            assert response.status_code == 200
-            data = response.json()
-
-            # Verify required fields are present
-            assert "answer" in data
-            assert "sources" in data
-            assert "trace" in data
-            assert "metrics" in data
-
-            # Verify metrics structure
-            assert "latency_ms" in data["metrics"]
-            assert "token_usage" in data["metrics"]
-
-            # Verify source structure
-            if data["sources"]:
-                source = data["sources"][0]
-                assert "id" in source
-                assert "title" in source
-                assert "content" in source
-                assert "similarity_score" in source
-
-            # Verify trace structure
-            if data["trace"]:
-                step = data["trace"][0]
-                assert "agent_name" in step
-                assert "step_name" in step
-                assert "input" in step
-                assert "output" in step
-                assert "duration_ms" in step
-                assert "timestamp" in step
+        assert response.status_code == 200
+        # Raises if any required field, nested source field or trace field is missing
+        parsed = ProcessResponse.model_validate(response_json(response))
+        assert len(parsed.sources) == 1
+        assert len(parsed.trace) == 1
 
 
 class TestAPIIntegration:
     """Test API integration scenarios."""
 
-    @patch('src.main.workflow')
-    def test_multiple_concurrent_requests(self, mock_workflow, client, mock_workflow_result):
+    async def test_multiple_concurrent_requests(self, mock_workflow, async_client, mock_workflow_result):
         """Test handling multiple concurrent requests."""
-        import asyncio
-        import concurrent.futures
+        mock_workflow.process_request.return_value = mock_workflow_result
 
-        mock_workflow.process_request = AsyncMock(
-            return_value=mock_workflow_result)
-
-        def make_request():
-            return client.post(
-                "/process",
-                json={"request_text": "Concurrent test request"}
-            )
-
-        # Send multiple requests concurrently
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(make_request) for _ in range(5)]
-            responses = [future.result() for future in futures]
+        # Send multiple requests concurrently on one event loop
+        responses = await asyncio.gather(*(
+            async_client.post("/process", json={"request_text": "Concurrent test request"})
+            for _ in range(5)
+        ))
 
         # All requests should succeed
         for response in responses:
@@ -261,23 +300,37 @@ class TestAPIIntegration:
         # Verify workflow was called for each request
         assert mock_workflow.process_request.call_count == 5
 
-    def test_large_request_handling(self, client):
+    def test_large_request_handling(self, client, mock_workflow):
         """Test handling of large request texts."""
-        large_text = "This is a very long request. " * 1000  # ~20,000 characters
+        mock_workflow.process_request.return_value = {
+            "answer": "Response to large request",
+            "sources": [],
+            "trace": [],
+            "metrics": {"latency_ms": 1000, "token_usage": 100}
+        }
 
-        with patch('src.main.workflow') as mock_workflow:
-            mock_workflow.process_request = AsyncMock(return_value={
-                "answer": "Response to large request",
-                "sources": [],
-                "trace": [],
-                "metrics": {"latency_ms": 1000, "token_usage": 100}
-            })
+        response = client.post(
+            "/process", content=LARGE_REQUEST_BODY,
+            headers={"content-type": "application/json"})
 
-            response = client.post(
-                "/process", json={"request_text": large_text})
+        assert response.status_code == 200
+        mock_workflow.process_request.assert_called_once_with(LARGE_REQUEST_TEXT)
 
-            assert response.status_code == 200
-            mock_workflow.process_request.assert_called_once_with(large_text)
+
+@pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None,
+                    reason="pytest-benchmark is not installed")
+@pytest.mark.benchmark(group="process")
+class TestProcessBenchmark:
+    """Benchmark /process request overhead, with the workflow mocked out."""
+
+    def test_process_benchmark(self, benchmark, client, mock_workflow, mock_workflow_result):
+        """Time one /process round trip through validation and serialization."""
+        mock_workflow.process_request.return_value = mock_workflow_result
+
+        response = benchmark(
+            client.post, "/process", json={"request_text": "I forgot my password"})
+
+        assert response.status_code == 200
 
 
 if __name__ == "__main__":
@@ -22,8 +22,12 @@ export const apiClient = {
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
+        // Validation errors (422) carry a list of issues instead of a string
+        const detail = Array.isArray(errorData.detail)
+          ? errorData.detail.map((issue: { msg: string }) => issue.msg).join(", ")
+          : errorData.detail;
         throw new ApiError(
-          errorData.detail || `HTTP error! status: ${response.status}`,
+          detail || `HTTP error! status: ${response.status}`,
           response.status,
           errorData
         );
@@ -0,0 +1,9 @@
+-- Wipe the knowledge base in O(1) instead of a row-by-row DELETE
+CREATE OR REPLACE FUNCTION truncate_documents()
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+TRUNCATE TABLE documents RESTART IDENTITY CASCADE;
+$$;
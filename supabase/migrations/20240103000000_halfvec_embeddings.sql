@@ -0,0 +1,33 @@
+-- Store embeddings as halfvec (FP16) to halve table and index size
+DROP INDEX IF EXISTS documents_embedding_idx;
+
+ALTER TABLE documents
+ALTER COLUMN embedding TYPE HALFVEC(1536)
+USING embedding::HALFVEC(1536);
+
+-- Recreate similarity search on the halfvec column
+DROP FUNCTION IF EXISTS match_documents(VECTOR(1536), FLOAT);
+
+CREATE OR REPLACE FUNCTION match_documents(query_embedding HALFVEC(1536), match_threshold FLOAT)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    content TEXT,
+    similarity FLOAT
+)
+LANGUAGE sql
+AS $$
+SELECT
+    documents.id,
+    documents.title,
+    documents.content,
+    1 - (documents.embedding <=> query_embedding) AS similarity
+FROM documents
+WHERE 1 - (documents.embedding <=> query_embedding) > match_threshold
+ORDER BY similarity DESC;
+$$;
+
+-- HNSW index over the FP16 vectors
+CREATE INDEX IF NOT EXISTS documents_embedding_idx
+ON documents
+USING hnsw (embedding halfvec_cosine_ops) WITH (m = 24, ef_construction = 128);
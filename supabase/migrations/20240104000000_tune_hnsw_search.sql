@@ -0,0 +1,33 @@
+-- Let match_documents use the HNSW index: order by raw distance with a LIMIT,
+-- then apply the similarity threshold to the candidates
+DROP FUNCTION IF EXISTS match_documents(HALFVEC(1536), FLOAT);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding HALFVEC(1536),
+    match_threshold FLOAT,
+    match_count INT DEFAULT 5
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    content TEXT,
+    similarity FLOAT
+)
+LANGUAGE sql
+-- Search deeper than the default of 40 candidates for better recall
+SET hnsw.ef_search = 100
+AS $$
+SELECT *
+FROM (
+    SELECT
+        documents.id,
+        documents.title,
+        documents.content,
+        1 - (documents.embedding <=> query_embedding) AS similarity
+    FROM documents
+    ORDER BY documents.embedding <=> query_embedding
+    LIMIT match_count
+) candidates
+WHERE candidates.similarity > match_threshold
+ORDER BY candidates.similarity DESC;
+$$;
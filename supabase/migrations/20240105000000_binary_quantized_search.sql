@@ -0,0 +1,42 @@
+-- Two-stage search: recall candidates on binary-quantized embeddings,
+-- then rerank them by exact halfvec cosine distance
+CREATE INDEX IF NOT EXISTS documents_embedding_bits_idx
+ON documents
+USING hnsw ((binary_quantize(embedding)::BIT(1536)) bit_hamming_ops);
+
+DROP FUNCTION IF EXISTS match_documents(HALFVEC(1536), FLOAT, INT);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding HALFVEC(1536),
+    match_threshold FLOAT,
+    match_count INT DEFAULT 5
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    content TEXT,
+    similarity FLOAT
+)
+LANGUAGE sql
+-- The index scan returns at most ef_search rows, so keep it >= the candidate pool
+SET hnsw.ef_search = 200
+AS $$
+SELECT *
+FROM (
+    SELECT
+        candidates.id,
+        candidates.title,
+        candidates.content,
+        1 - (candidates.embedding <=> query_embedding) AS similarity
+    FROM (
+        SELECT documents.id, documents.title, documents.content, documents.embedding
+        FROM documents
+        ORDER BY binary_quantize(documents.embedding)::BIT(1536) <~> binary_quantize(query_embedding)
+        LIMIT 200
+    ) candidates
+    ORDER BY candidates.embedding <=> query_embedding
+    LIMIT match_count
+) reranked
+WHERE reranked.similarity > match_threshold
+ORDER BY reranked.similarity DESC;
+$$;
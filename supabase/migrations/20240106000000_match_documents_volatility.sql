@@ -0,0 +1,3 @@
+-- match_documents only reads, so mark it STABLE and PARALLEL SAFE instead of
+-- the default VOLATILE; the planner can then cache and parallelize around it
+ALTER FUNCTION match_documents(HALFVEC(1536), FLOAT, INT) STABLE PARALLEL SAFE;
@@ -0,0 +1,4 @@
+-- truncate_documents runs as its owner; only the service role may call it,
+-- otherwise the anon key could wipe the knowledge base through /rpc
+REVOKE EXECUTE ON FUNCTION truncate_documents() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION truncate_documents() TO service_role;